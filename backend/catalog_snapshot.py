@@ -0,0 +1,116 @@
+import asyncio
+import hashlib
+import time
+import msgpack
+from threading import Lock
+from database import inventory_collection
+from models.inventory import InventoryItem
+import change_feed
+import http_cache
+
+# InventoryItem fields shipped in the snapshot, in column order
+SNAPSHOT_FIELDS = ("id", "name", "category", "price", "stock", "unit", "supplier", "min_order_quantity")
+
+# Low-cardinality text columns are dictionary encoded: the column holds
+# small integer codes into a per-column list of distinct values.
+DICTIONARY_FIELDS = ("category", "unit", "supplier")
+
+# How often the background task checks whether the catalog changed
+REBUILD_INTERVAL = 600
+
+# Snapshots are content-addressed, so clients can keep one for hours and
+# catch up through /inventory/changes from the embedded cursor.
+SNAPSHOT_MAX_AGE = 6 * 60 * 60
+
+
+class CatalogSnapshot:
+    """
+    Columnar MessagePack encoding of one region's catalog for offline-first
+    clients, rebuilt in the background when that region's inventory changes.
+    """
+
+    def __init__(self, region: str):
+        self.region = region
+        self.resource = http_cache.regional("inventory", region)
+        self._lock = Lock()
+        self.payload = None
+        self.etag = None
+        self.built_for_version = None
+        self.built_at = None
+
+    def current(self):
+        """Return (payload, etag), building the first snapshot if needed"""
+        if self.payload is None:
+            self.rebuild()
+        return self.payload, self.etag
+
+    def rebuild(self):
+        version = http_cache.current_version(self.resource)
+        # Take the cursor before reading so changes made during the scan
+        # are replayed by the client's first delta sync.
+        cursor = change_feed.safe_cursor()
+        docs = inventory_collection.find(
+            {"region": self.region},
+            {field: 1 for field in SNAPSHOT_FIELDS if field != "id"}
+        )
+        payload = encode(docs, cursor)
+        etag = '"' + hashlib.sha256(payload).hexdigest()[:20] + '"'
+        with self._lock:
+            self.payload, self.etag = payload, etag
+            self.built_for_version = version
+            self.built_at = time.time()
+
+    def is_stale(self) -> bool:
+        return self.built_for_version != http_cache.current_version(self.resource)
+
+
+_snapshots = {}
+_snapshots_lock = Lock()
+
+
+def snapshot_for(region: str) -> CatalogSnapshot:
+    with _snapshots_lock:
+        snapshot = _snapshots.get(region)
+        if snapshot is None:
+            snapshot = _snapshots[region] = CatalogSnapshot(region)
+        return snapshot
+
+
+async def refresh_periodically():
+    """Background task started from the app lifespan; rebuilds snapshots clients have asked for"""
+    while True:
+        await asyncio.sleep(REBUILD_INTERVAL)
+        with _snapshots_lock:
+            snapshots = list(_snapshots.values())
+        for snapshot in snapshots:
+            if snapshot.payload is not None and snapshot.is_stale():
+                try:
+                    await asyncio.to_thread(snapshot.rebuild)
+                except Exception as e:
+                    print(f"❌ Catalog snapshot rebuild failed for {snapshot.region}:", e)
+
+
+def encode(docs, cursor: int) -> bytes:
+    defaults = {name: field.default for name, field in InventoryItem.model_fields.items()}
+    columns = {field: [] for field in SNAPSHOT_FIELDS}
+    dictionaries = {field: {} for field in DICTIONARY_FIELDS}
+
+    for doc in docs:
+        for field in SNAPSHOT_FIELDS:
+            if field == "id":
+                value = str(doc["_id"])
+            else:
+                value = doc.get(field, defaults[field])
+            if field in dictionaries:
+                value = dictionaries[field].setdefault(value, len(dictionaries[field]))
+            columns[field].append(value)
+
+    return msgpack.packb({
+        "format": 1,
+        "cursor": cursor,
+        "count": len(columns["id"]),
+        "fields": list(SNAPSHOT_FIELDS),
+        "dictionaries": {field: list(values) for field, values in dictionaries.items()},
+        "columns": columns
+    })
+
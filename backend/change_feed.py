@@ -0,0 +1,84 @@
+from datetime import datetime
+from threading import Lock
+from pymongo import ReturnDocument
+from database import counter_collection, inventory_collection, tombstone_collection
+
+# Every inventory write stamps the item with the next value of this
+# sequence, so clients can ask for "everything after N" with an indexed
+# range query instead of comparing wall-clock last_updated values.
+SEQUENCE_ID = "inventory_change_seq"
+
+# Sequence numbers handed out whose writes have not finished yet. A sync
+# cursor must stay below the lowest of these, or a slow writer could
+# commit behind a cursor a client has already moved past. Like the HTTP
+# cache versions this is per process, matching the single-worker setup.
+_in_flight = set()
+_high_water = 0
+_lock = Lock()
+
+
+def allocate(count: int = 1) -> int:
+    """Reserve count consecutive sequence numbers and return the first"""
+    global _high_water
+    doc = counter_collection.find_one_and_update(
+        {"_id": SEQUENCE_ID},
+        {"$inc": {"seq": count}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    first = doc["seq"] - count + 1
+    with _lock:
+        _in_flight.update(range(first, doc["seq"] + 1))
+        _high_water = max(_high_water, doc["seq"])
+    return first
+
+
+def release(first: int, count: int = 1):
+    """Mark reserved sequence numbers as written (or abandoned)"""
+    with _lock:
+        _in_flight.difference_update(range(first, first + count))
+
+
+def safe_cursor() -> int:
+    """Highest sequence number at or below which every change is visible"""
+    with _lock:
+        if _in_flight:
+            return min(_in_flight) - 1
+        return _high_water
+
+
+def record_deletion(item_id: str, region: str):
+    """Leave a tombstone so synced clients of the item's region drop it"""
+    seq = allocate()
+    try:
+        tombstone_collection.update_one(
+            {"item_id": item_id},
+            {"$set": {"change_seq": seq, "region": region, "deleted_at": datetime.now()}},
+            upsert=True
+        )
+    finally:
+        release(seq)
+
+
+def backfill():
+    """
+    Load the current sequence and stamp items written before the change
+    sequence existed. Called once at startup.
+    """
+    global _high_water
+    doc = counter_collection.find_one({"_id": SEQUENCE_ID})
+    with _lock:
+        _high_water = max(_high_water, doc["seq"] if doc else 0)
+
+    missing = list(inventory_collection.find({"change_seq": {"$exists": False}}, {"_id": 1}))
+    if not missing:
+        return
+    first = allocate(len(missing))
+    try:
+        for offset, doc in enumerate(missing):
+            inventory_collection.update_one(
+                {"_id": doc["_id"]},
+                {"$set": {"change_seq": first + offset}}
+            )
+    finally:
+        release(first, len(missing))
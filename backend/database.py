@@ -1,3 +1,4 @@
+from contextvars import ContextVar
 from pymongo import MongoClient
 from pymongo.server_api import ServerApi
 from dotenv import load_dotenv
@@ -6,14 +7,51 @@ import os
 # Load from .env file
 load_dotenv()
 
+# Imported after load_dotenv so the profiler sees PROFILE_* settings from .env
+from profiling import mongo_listener
+from regions import DEFAULT_REGION, region_for_point
+from price_compare import product_keys
+
 MONGODB_URI="mongodb+srv://<your_email>:<your_pass>@rasoisetu.tyrrv4c.mongodb.net/?retryWrites=true&w=majority&appName=Rasoisetu"
 
 
+# Workload classes. Latency-critical requests (logins, order writes) use
+# the primary pool; heavy admin/analytics reads get their own smaller pool
+# that prefers secondaries, so exports cannot starve order placement.
+OLTP = "oltp"
+ANALYTICS = "analytics"
+
 # Connect safely
 client = MongoClient(
     MONGODB_URI,
     server_api=ServerApi("1"),
-    tls=True
+    tls=True,
+    maxPoolSize=int(os.getenv("MONGO_OLTP_POOL_SIZE", "100")),
+    # Bound every operation instead of the driver defaults (30s server
+    # selection, no operation timeout); guarded reads in resilience.py
+    # tighten this further to the request's remaining budget
+    serverSelectionTimeoutMS=int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+    connectTimeoutMS=int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+    timeoutMS=int(os.getenv("MONGO_TIMEOUT_MS", "10000")),
+    # Records the commands issued by profiled requests
+    event_listeners=[mongo_listener]
+)
+
+analytics_client = MongoClient(
+    MONGODB_URI,
+    server_api=ServerApi("1"),
+    tls=True,
+    maxPoolSize=int(os.getenv("MONGO_ANALYTICS_POOL_SIZE", "10")),
+    # Fail admin reads instead of queueing forever when the pool is busy
+    waitQueueTimeoutMS=int(os.getenv("MONGO_ANALYTICS_WAIT_MS", "5000")),
+    serverSelectionTimeoutMS=int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+    connectTimeoutMS=int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+    # Reports scan more data than request paths
+    timeoutMS=int(os.getenv("MONGO_ANALYTICS_TIMEOUT_MS", "30000")),
+    readPreference="secondaryPreferred",
+    # Secondaries lagging more than this are skipped (90s is the driver minimum)
+    maxStalenessSeconds=int(os.getenv("MONGO_ANALYTICS_MAX_STALENESS", "90")),
+    event_listeners=[mongo_listener]
 )
 
 try:
@@ -27,3 +65,139 @@ except Exception as e:
 db = client["Rasoisetu"]
 vendor_collection = db["vendor"]
 seller_collection = db["seller"]
+inventory_collection = db["inventory"]
+order_collection = db["orders"]
+event_collection = db["events"]
+job_collection = db["jobs"]
+notification_collection = db["notifications"]
+analytics_collection = db["analytics"]
+counter_collection = db["counters"]
+tombstone_collection = db["inventory_tombstones"]
+
+analytics_db = analytics_client["Rasoisetu"]
+
+
+# Workload class of the route being handled, set by route_workload()
+_workload = ContextVar("workload", default=OLTP)
+
+
+def route_workload(workload: str):
+    """
+    Tag a route with its workload class:
+    @router.get(..., dependencies=[Depends(route_workload(ANALYTICS))])
+    collection() and current_workload() then pick that class's pool for
+    the request. Untagged routes are OLTP.
+    """
+    # async so the value is set in the request's own context, which
+    # Starlette copies into the threadpool running a sync endpoint
+    async def tag():
+        _workload.set(workload)
+    return tag
+
+
+def current_workload() -> str:
+    return _workload.get()
+
+
+def collection(name: str, workload: str = None):
+    """Get a collection through the pool of a workload class, by default the route's"""
+    if (workload or current_workload()) == ANALYTICS:
+        return analytics_db[name]
+    return db[name]
+
+
+def ensure_indexes():
+    """Create the indexes the API relies on (no-op if they already exist)"""
+    # Catalog filtering: exact category match on in-stock items
+    inventory_collection.create_index([("category", 1), ("stock", 1)])
+    # Nearest-supplier lookups
+    seller_collection.create_index([("location", "2dsphere")])
+    vendor_collection.create_index([("location", "2dsphere")])
+    # Order and seller timelines
+    event_collection.create_index([("entity", 1), ("entity_id", 1), ("at", 1)])
+    # Background jobs: crash recovery scans unfinished jobs
+    job_collection.create_index([("status", 1), ("created_at", 1)])
+    notification_collection.create_index([("recipient", 1), ("created_at", -1)])
+    analytics_collection.create_index("date", unique=True)
+    # Inventory delta sync
+    inventory_collection.create_index("change_seq")
+    tombstone_collection.create_index("change_seq")
+    tombstone_collection.create_index("item_id", unique=True)
+    # Vendor order history
+    order_collection.create_index([("vendor_id", 1), ("created_at", -1)])
+
+    # Region partitions: every regional query filters on region first, so
+    # its cost depends on the size of that city's data, not the total
+    inventory_collection.create_index([("region", 1), ("category", 1), ("stock", 1)])
+    inventory_collection.create_index([("region", 1), ("change_seq", 1)])
+    tombstone_collection.create_index([("region", 1), ("change_seq", 1)])
+    seller_collection.create_index([("region", 1), ("status", 1)])
+    seller_collection.create_index([("region", 1), ("location", "2dsphere")])
+    order_collection.create_index([("region", 1), ("created_at", -1)])
+
+
+# Collections partitioned by region. On a sharded cluster (MONGO_SHARDED=1)
+# they are sharded on {region, _id}, so each city's documents live in
+# their own chunk ranges and regional queries are routed to one shard.
+PARTITIONED_COLLECTIONS = [vendor_collection, seller_collection, inventory_collection, order_collection]
+SHARDED = os.getenv("MONGO_SHARDED", "0") == "1"
+
+
+def with_shard_key(partitioned, query: dict) -> dict:
+    """
+    Add the document's region to a single-document write filter on a
+    partitioned collection. Before MongoDB 7.1, findAndModify on a sharded
+    collection must name the shard key, so when MONGO_SHARDED is set and
+    the caller does not know the region it is looked up first.
+    """
+    if not SHARDED or "region" in query:
+        return query
+    doc = partitioned.find_one(query, {"region": 1})
+    if doc is None or "region" not in doc:
+        return query
+    return {**query, "region": doc["region"]}
+
+
+def shard_collections():
+    """Shard the partitioned collections by region (sharded clusters only)"""
+    if not SHARDED:
+        return
+    try:
+        client.admin.command("enableSharding", db.name)
+        for partitioned in PARTITIONED_COLLECTIONS:
+            partitioned.create_index([("region", 1), ("_id", 1)])
+            client.admin.command("shardCollection", partitioned.full_name, key={"region": 1, "_id": 1})
+    except Exception as e:
+        print("❌ Could not shard collections by region:", e)
+
+
+def backfill_product_keys():
+    """Add the normalized product_keys nearby-supplier search matches on to older sellers"""
+    for seller in seller_collection.find({"product_keys": {"$exists": False}}, {"products": 1}):
+        keys = sorted({key for product in seller.get("products", []) for key in product_keys(product)})
+        seller_collection.update_one({"_id": seller["_id"]}, {"$set": {"product_keys": keys}})
+
+
+def backfill_regions():
+    """
+    Stamp a region on documents written before partitioning. Sellers and
+    vendors go by their location, inventory by its supplier's region, and
+    anything else to DEFAULT_REGION. Called once at startup.
+    """
+    missing = {"region": {"$exists": False}}
+    for partitioned in (seller_collection, vendor_collection):
+        for doc in partitioned.find(missing, {"location": 1}):
+            region = DEFAULT_REGION
+            if doc.get("location"):
+                longitude, latitude = doc["location"]["coordinates"]
+                region = region_for_point(latitude, longitude)
+            partitioned.update_one({"_id": doc["_id"]}, {"$set": {"region": region}})
+
+    supplier_regions = {}
+    for seller in seller_collection.find({"name": {"$exists": True}}, {"name": 1, "region": 1}):
+        supplier_regions.setdefault(seller.get("region", DEFAULT_REGION), []).append(seller["name"])
+    for region, names in supplier_regions.items():
+        inventory_collection.update_many({**missing, "supplier": {"$in": names}}, {"$set": {"region": region}})
+
+    for partitioned in (inventory_collection, order_collection, tombstone_collection):
+        partitioned.update_many(missing, {"$set": {"region": DEFAULT_REGION}})
@@ -0,0 +1,123 @@
+from collections import deque
+from datetime import datetime
+from threading import Condition, Thread
+from bson.objectid import ObjectId
+from pymongo.errors import BulkWriteError
+from database import event_collection
+
+
+class EventLog:
+    """
+    Append-only lifecycle log for orders and sellers.
+
+    Handlers call record(), which only appends to an in-memory buffer; a
+    background thread writes the buffer out with insert_many in batches.
+    record() never touches the database and never raises, since handlers
+    call it after their own write has committed. Events recorded before
+    start() wait in the buffer. The buffer is bounded: while it is full
+    (the database has been unreachable for a while) new events are
+    dropped and counted in `dropped`. stop() flushes whatever is still
+    buffered.
+    """
+
+    def __init__(self, collection, max_pending: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 0.5):
+        self.collection = collection
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = deque()
+        self._cond = Condition()
+        self._thread = None
+        self._running = False
+        self.dropped = 0
+
+    def record(self, entity: str, entity_id: str, event: str, **data):
+        """Queue one lifecycle event, e.g. record("order", "AB12CD34", "status_changed", to="shipped")"""
+        # The id is assigned here rather than by insert_many so readers can
+        # tell a buffered event from the same event read back from MongoDB
+        doc = {
+            "_id": ObjectId(),
+            "entity": entity,
+            "entity_id": entity_id,
+            "event": event,
+            "data": data,
+            "at": datetime.utcnow()
+        }
+        with self._cond:
+            if len(self._pending) < self.max_pending:
+                self._pending.append(doc)
+                if len(self._pending) >= self.batch_size:
+                    self._cond.notify()
+                return
+            self.dropped += 1
+            dropped = self.dropped
+        if dropped == 1 or dropped % 1000 == 0:
+            print(f"❌ Event log buffer full, {dropped} events dropped so far")
+
+    def pending_for(self, entity: str, entity_id: str) -> list:
+        """Events for one entity that have not been flushed yet"""
+        with self._cond:
+            return [
+                dict(doc) for doc in self._pending
+                if doc["entity"] == entity and doc["entity_id"] == entity_id
+            ]
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = Thread(target=self._run, name="event-log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the writer thread and flush everything still buffered"""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        while self._pending and self._flush_batch():
+            pass
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._running and len(self._pending) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                if not self._running:
+                    return
+            if self._flush_batch() is None:
+                # Back off before retrying a failed batch
+                with self._cond:
+                    self._cond.wait(self.flush_interval)
+
+    def _flush_batch(self):
+        """Write up to batch_size buffered events; returns the count, or None on failure"""
+        with self._cond:
+            batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+        if not batch:
+            return 0
+        try:
+            self.collection.insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            # Duplicate keys mean part of the batch was written by an earlier
+            # attempt; anything else is retried.
+            errors = e.details.get("writeErrors", [])
+            if e.details.get("writeConcernErrors") or any(err.get("code") != 11000 for err in errors):
+                return self._requeue(batch, e)
+        except Exception as e:
+            return self._requeue(batch, e)
+        return len(batch)
+
+    def _requeue(self, batch: list, error: Exception):
+        print("❌ Event log flush failed, retrying later:", error)
+        # Put the batch back at the front so ordering is preserved
+        with self._cond:
+            self._pending.extendleft(reversed(batch))
+        return None
+
+
+event_log = EventLog(event_collection)
@@ -0,0 +1,118 @@
+from collections import Counter
+from threading import Lock
+from regions import PerRegion
+
+# Upper bounds of the price buckets shown in the catalog sidebar;
+# the last bucket is open ended.
+PRICE_BUCKETS = [50, 100, 250, 500, 1000]
+
+
+def price_bucket(price: float) -> str:
+    lower = 0
+    for upper in PRICE_BUCKETS:
+        if price < upper:
+            return f"{lower}-{upper}"
+        lower = upper
+    return f"{lower}+"
+
+
+class FacetIndex:
+    """
+    Category, price range and supplier counts for in-stock inventory,
+    maintained incrementally from inventory writes instead of being
+    recomputed with distinct/aggregate queries on every request.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._items = {}  # item id -> (category, price bucket, supplier, in stock)
+        self._all_categories = Counter()
+        self.categories = Counter()
+        self.price_ranges = Counter()
+        self.suppliers = Counter()
+        self.loaded = False
+
+    def load(self, docs):
+        """Rebuild every count from a full scan of the inventory collection"""
+        with self._lock:
+            self._items.clear()
+            self._all_categories.clear()
+            self.categories.clear()
+            self.price_ranges.clear()
+            self.suppliers.clear()
+            for doc in docs:
+                self._add(str(doc["_id"]), doc)
+            self.loaded = True
+
+    def upsert(self, doc: dict):
+        """Apply an inserted or updated inventory document"""
+        item_id = str(doc["_id"])
+        with self._lock:
+            self._discard(item_id)
+            self._add(item_id, doc)
+
+    def remove(self, item_id: str):
+        with self._lock:
+            self._discard(item_id)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "categories": dict(sorted(self.categories.items())),
+                "price_ranges": {
+                    bucket: self.price_ranges[bucket]
+                    for bucket in self._bucket_order()
+                    if self.price_ranges[bucket]
+                },
+                "suppliers": dict(self.suppliers.most_common()),
+                "total_items": sum(self.categories.values()),
+            }
+
+    def all_categories(self) -> list:
+        with self._lock:
+            return sorted(self._all_categories)
+
+    def _add(self, item_id: str, doc: dict):
+        entry = (
+            doc["category"],
+            price_bucket(doc["price"]),
+            doc["supplier"],
+            doc.get("stock", 0) > 0,
+        )
+        self._items[item_id] = entry
+        self._all_categories[entry[0]] += 1
+        if entry[3]:
+            self.categories[entry[0]] += 1
+            self.price_ranges[entry[1]] += 1
+            self.suppliers[entry[2]] += 1
+
+    def _discard(self, item_id: str):
+        entry = self._items.pop(item_id, None)
+        if entry is None:
+            return
+        _decrement(self._all_categories, entry[0])
+        if entry[3]:
+            _decrement(self.categories, entry[0])
+            _decrement(self.price_ranges, entry[1])
+            _decrement(self.suppliers, entry[2])
+
+    @staticmethod
+    def _bucket_order():
+        lower = 0
+        for upper in PRICE_BUCKETS:
+            yield f"{lower}-{upper}"
+            lower = upper
+        yield f"{lower}+"
+
+
+def _decrement(counter: Counter, key):
+    counter[key] -= 1
+    if counter[key] <= 0:
+        del counter[key]
+
+
+# Projection used when (re)loading the index from MongoDB
+FACET_FIELDS = {"category": 1, "price": 1, "supplier": 1, "stock": 1, "region": 1}
+
+# Facet counts are per city; read them with facet_index.for_region(region)
+facet_index = PerRegion(FacetIndex)
@@ -0,0 +1,34 @@
+from math import radians, sin, cos, asin, sqrt
+from typing import Optional
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def to_point(latitude: Optional[float], longitude: Optional[float]):
+    """Build a GeoJSON point for a 2dsphere index, or None if no location was given"""
+    if latitude is None or longitude is None:
+        return None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError("Latitude must be within ±90 and longitude within ±180")
+    # GeoJSON stores coordinates as [longitude, latitude]
+    return {"type": "Point", "coordinates": [longitude, latitude]}
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance between two points in kilometres"""
+    lat1, lng1, lat2, lng2 = map(radians, (lat1, lng1, lat2, lng2))
+    a = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * asin(sqrt(a))
+
+
+def estimate_delivery(distance_km: Optional[float]) -> str:
+    """Rough delivery estimate from supplier distance, matching the existing text format"""
+    if distance_km is None:
+        return "2-3 days"
+    if distance_km <= 5:
+        return "Same day"
+    if distance_km <= 25:
+        return "1 day"
+    if distance_km <= 100:
+        return "1-2 days"
+    return "2-3 days"
@@ -0,0 +1,122 @@
+from fastapi import Request, Response
+from starlette.middleware.gzip import GZipMiddleware
+from email.utils import formatdate, parsedate_to_datetime
+from threading import Lock
+import hashlib
+import math
+import re
+import time
+
+# Resources whose payloads are cached by clients. Each one carries a version
+# counter that is bumped on every write, so a conditional request can be
+# answered from the counter alone without touching the database.
+# Versions start from the process start time so ETags handed out by a
+# previous run are never mistaken for current ones.
+#
+# Listings scoped to one region use "<resource>:<region>" (see regional()).
+# A write in a region bumps that region's counter and the cross-region
+# one; a write without a region bumps "<resource>:*", which every
+# regional version includes.
+_start = int(time.time())
+_versions = {"inventory": _start, "seller": _start, "inventory:*": _start, "seller:*": _start}
+_modified_at = {key: float(_start) for key in _versions}
+_lock = Lock()
+
+# Browsers and the Next.js proxy may reuse a response for this long before
+# revalidating with If-None-Match / If-Modified-Since.
+DEFAULT_MAX_AGE = 30
+
+
+def regional(resource: str, region: str) -> str:
+    """Cache resource for one region's view of a resource"""
+    return f"{resource}:{region}"
+
+
+def bump(resource: str, region: str = None):
+    """Mark a resource as changed after a write, in one region or everywhere"""
+    key = regional(resource, region or "*")
+    with _lock:
+        # HTTP dates have one second resolution, so modification times are
+        # whole seconds, rounded up and always past the previous one. A
+        # second write within the second a Last-Modified was served from
+        # then gets a later date instead of matching If-Modified-Since.
+        now = math.floor(time.time()) + 1
+        for name in (resource, key):
+            _versions[name] = _versions.get(name, 0) + 1
+            _modified_at[name] = float(max(now, _modified_at.get(name, _start) + 1))
+
+
+def current_version(resource: str) -> str:
+    base, _, region = resource.partition(":")
+    if not region:
+        return str(_versions[base])
+    return f"{_versions[base + ':*']}.{_versions.get(resource, 0)}"
+
+
+def _last_modified(resource: str) -> float:
+    base, _, region = resource.partition(":")
+    if not region:
+        return _modified_at[base]
+    return max(_modified_at[base + ":*"], _modified_at.get(resource, float(_start)))
+
+
+def etag_for(resource: str, *parts) -> str:
+    """Build a weak ETag from the resource version and the request parameters"""
+    key = "|".join(str(part) for part in parts)
+    digest = hashlib.md5(key.encode()).hexdigest()[:12]
+    return f'W/"{resource}-{current_version(resource)}-{digest}"'
+
+
+def not_modified(request: Request, resource: str, etag: str):
+    """
+    Return a 304 response if the client already holds the current payload,
+    otherwise None. Callers check this before doing any database work.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        if etag in candidates or "*" in candidates:
+            return Response(status_code=304, headers=_cache_headers(resource, etag))
+        return None
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return None
+        if _last_modified(resource) <= since:
+            return Response(status_code=304, headers=_cache_headers(resource, etag))
+
+    return None
+
+
+def set_cache_headers(response: Response, resource: str, etag: str, max_age: int = DEFAULT_MAX_AGE):
+    """Attach validators and Cache-Control to a full response"""
+    response.headers.update(_cache_headers(resource, etag, max_age))
+
+
+def _cache_headers(resource: str, etag: str, max_age: int = DEFAULT_MAX_AGE) -> dict:
+    return {
+        "ETag": etag,
+        "Last-Modified": formatdate(_last_modified(resource), usegmt=True),
+        "Cache-Control": f"public, max-age={max_age}, must-revalidate",
+    }
+
+
+class SelectiveGZipMiddleware(GZipMiddleware):
+    """
+    GZip middleware that leaves some paths alone: already-compressed files
+    (PDFs, images) gain nothing, and compressing a 206 response would break
+    byte ranges.
+    """
+
+    def __init__(self, app, skip_paths: list, **kwargs):
+        super().__init__(app, **kwargs)
+        self.skip = re.compile("|".join(f"(?:{pattern})" for pattern in skip_paths))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and self.skip.fullmatch(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
@@ -0,0 +1,181 @@
+import asyncio
+import random
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from database import job_collection
+
+
+class JobQueue:
+    """
+    In-process background job queue.
+
+    Jobs are persisted to the jobs collection when enqueued, then run by a
+    pool of asyncio workers. Handlers are plain (blocking) functions and
+    run in a thread so pymongo calls do not stall the event loop. Failed
+    jobs are retried with exponential backoff and jitter. On startup, jobs
+    left queued or running by a previous process are picked up again, so
+    handlers should be safe to run more than once.
+    """
+
+    def __init__(self, collection, workers: int = 4, max_attempts: int = 5,
+                 base_delay: float = 0.5, max_delay: float = 60.0):
+        self.collection = collection
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.handlers = {}
+        self._loop = None
+        self._queue = None
+        self._tasks = []
+        self._delayed = 0
+        self._running = 0
+        self._stats = {"enqueued": 0, "completed": 0, "failed": 0, "retried": 0}
+        self._latencies = deque(maxlen=1000)  # enqueue -> done, seconds
+        self._run_times = deque(maxlen=1000)  # handler execution, seconds
+
+    def handler(self, name: str):
+        """Register a handler: @job_queue.handler("order.notify")"""
+        def register(func):
+            self.handlers[name] = func
+            return func
+        return register
+
+    def enqueue(self, name: str, payload: dict):
+        return self.enqueue_many([(name, payload)])[0]
+
+    def enqueue_many(self, jobs: list) -> list:
+        """
+        Persist several jobs with a single insert_many and hand them to the
+        workers. Safe to call from request threads.
+        """
+        now = datetime.utcnow()
+        docs = [
+            {
+                "name": name,
+                "payload": payload,
+                "status": "queued",
+                "attempts": 0,
+                "created_at": now,
+                "run_at": now
+            }
+            for name, payload in jobs
+        ]
+        self.collection.insert_many(docs)
+        self._stats["enqueued"] += len(docs)
+        # Before start() the jobs stay persisted and are recovered on startup
+        if self._loop is not None:
+            for doc in docs:
+                self._loop.call_soon_threadsafe(self._queue.put_nowait, doc)
+        return [doc["_id"] for doc in docs]
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+
+        # Crash recovery: anything not finished by a previous run
+        unfinished = await asyncio.to_thread(
+            lambda: list(self.collection.find({"status": {"$in": ["queued", "running"]}}).sort("created_at", 1))
+        )
+        for doc in unfinished:
+            self._queue.put_nowait(doc)
+
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Stop the workers; unfinished jobs stay persisted for the next start"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+
+    def metrics(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "delayed_retries": self._delayed,
+            "running": self._running,
+            "workers": len(self._tasks),
+            **self._stats,
+            "latency_ms": _percentiles(self._latencies),
+            "run_time_ms": _percentiles(self._run_times)
+        }
+
+    async def _worker(self):
+        while True:
+            doc = await self._queue.get()
+            try:
+                await self._run(doc)
+            except Exception as e:
+                # A worker must outlive any one job, database blips included
+                print(f"❌ Job {doc.get('name')} could not be processed:", e)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, doc: dict):
+        handler = self.handlers.get(doc["name"])
+        if handler is None:
+            self._stats["failed"] += 1
+            await self._persist(doc, status="failed", error=f"No handler for {doc['name']}")
+            return
+
+        doc["attempts"] += 1
+        self._running += 1
+        started = time.perf_counter()
+        try:
+            await self._set(doc, status="running", attempts=doc["attempts"])
+            await asyncio.to_thread(handler, doc["payload"])
+            self._run_times.append(time.perf_counter() - started)
+            # If this write fails the job is retried like a failed handler;
+            # handlers are idempotent, so running it again is safe.
+            await self._set(doc, status="done", finished_at=datetime.utcnow())
+        except Exception as e:
+            await self._failed(doc, e)
+            return
+        finally:
+            self._running -= 1
+
+        self._latencies.append((datetime.utcnow() - doc["created_at"]).total_seconds())
+        self._stats["completed"] += 1
+
+    async def _failed(self, doc: dict, error: Exception):
+        if doc["attempts"] >= self.max_attempts:
+            print(f"❌ Job {doc['name']} failed after {doc['attempts']} attempts:", error)
+            self._stats["failed"] += 1
+            await self._persist(doc, status="failed", error=str(error))
+            return
+
+        # Exponential backoff with full jitter. The retry is scheduled even
+        # if the status write fails, so a database blip cannot strand a job.
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (doc["attempts"] - 1)))
+        await self._persist(doc, status="queued", error=str(error),
+                            run_at=datetime.utcnow() + timedelta(seconds=delay))
+        self._stats["retried"] += 1
+        self._delayed += 1
+        self._loop.call_later(delay, self._requeue, doc)
+
+    def _requeue(self, doc: dict):
+        self._delayed -= 1
+        self._queue.put_nowait(doc)
+
+    async def _set(self, doc: dict, **fields):
+        await asyncio.to_thread(self.collection.update_one, {"_id": doc["_id"]}, {"$set": fields})
+
+    async def _persist(self, doc: dict, **fields):
+        """_set for bookkeeping writes whose failure must not stop the job's handling"""
+        try:
+            await self._set(doc, **fields)
+        except Exception as e:
+            print(f"❌ Could not record status of job {doc['name']}:", e)
+
+
+def _percentiles(samples) -> dict:
+    if not samples:
+        return {"p50": None, "p95": None, "max": None}
+    ordered = sorted(samples)
+    pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+    return {"p50": pick(0.5), "p95": pick(0.95), "max": round(ordered[-1] * 1000, 2)}
+
+
+job_queue = JobQueue(job_collection)
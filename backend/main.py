@@ -1,10 +1,56 @@
 from fastapi import FastAPI
-from routes import auth, seller
+from contextlib import asynccontextmanager
+import asyncio
+from routes import auth, seller, inventory, suppliers, documents, images, debug
 from fastapi.middleware.cors import CORSMiddleware
 from seller_status_route import router as seller_status_router
+from http_cache import SelectiveGZipMiddleware
+from database import ensure_indexes, backfill_regions, backfill_product_keys, shard_collections, inventory_collection
+from facets import facet_index, FACET_FIELDS
+from pricing import price_index, PRICE_FIELDS
+from price_compare import price_comparison, COMPARE_FIELDS
+from event_log import event_log
+from jobs import job_queue
+import order_tasks  # registers the order job handlers
+import change_feed
+import catalog_snapshot
+from order_commit import order_batcher, GROUP_COMMIT_ENABLED
+from thumbnails import thumbnail_cache
+from profiling import profiler, ProfilingMiddleware, bind_endpoints
+from resilience import DeadlineMiddleware, breakers
+from regions import RegionMiddleware
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    ensure_indexes()
+    backfill_regions()
+    backfill_product_keys()
+    shard_collections()
+    change_feed.backfill()
+    # One catalog scan feeds all in-memory indexes (split per region where
+    # the index is regional)
+    catalog = list(inventory_collection.find({}, {**FACET_FIELDS, **PRICE_FIELDS, **COMPARE_FIELDS}))
+    facet_index.load(catalog)
+    price_index.load(catalog)
+    price_comparison.load(catalog)
+    event_log.start()
+    await job_queue.start()
+    snapshot_task = asyncio.create_task(catalog_snapshot.refresh_periodically())
+    if GROUP_COMMIT_ENABLED:
+        order_batcher.start()
+    thumbnail_cache.start()
+    profiler.start()
+    yield
+    profiler.stop()
+    thumbnail_cache.stop()
+    order_batcher.stop()
+    snapshot_task.cancel()
+    await job_queue.stop()
+    event_log.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 @app.get("/")
@@ -13,15 +59,50 @@ def read_root():
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy", "message": "Backend server is operational"}
+    return {
+        "status": "healthy",
+        "message": "Backend server is operational",
+        "database": {name: breaker.status() for name, breaker in breakers.items()}
+    }
+
+@app.get("/jobs/metrics")
+def job_metrics():
+    return job_queue.metrics()
 
 app.include_router(auth.router)
 app.include_router(seller.router)
+app.include_router(inventory.router)
+app.include_router(suppliers.router)
+app.include_router(documents.router)
+app.include_router(images.router)
 app.include_router(seller_status_router)
+app.include_router(debug.router)
+bind_endpoints(app)
 
+# Catalog and seller listings are repetitive JSON and compress well;
+# small responses (health checks, 304s) and uploaded files are left alone.
+app.add_middleware(
+    SelectiveGZipMiddleware,
+    skip_paths=[r"/seller/[^/]+/documents/[^/]+", r"/images/.+"],
+    minimum_size=1000
+)
+
+# Picks the city partition each request reads and writes
+app.add_middleware(RegionMiddleware)
+
+# Per-request time budget for Mongo operations; strips cache validators
+# from responses served from stale cache while the database is down
+app.add_middleware(DeadlineMiddleware)
+
+# Outside RegionMiddleware, so its 400 for an unknown city still carries
+# CORS headers and preflights are answered before any region check
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000"],  # Frontend origin
     allow_methods=["*"],
     allow_headers=["*"],
 )
+
+# Outermost, so profiled durations include compression. Inactive unless
+# PROFILE_TOKEN is set.
+app.add_middleware(ProfilingMiddleware, profiler=profiler)
@@ -25,9 +25,15 @@ class OrderCreate(BaseModel):
     vendor_id: str
     items: List[OrderItem]
     delivery_address: str
+    delivery_latitude: Optional[float] = None
+    delivery_longitude: Optional[float] = None
     notes: Optional[str] = ""
     estimated_delivery: Optional[str] = None
 
+class CartQuote(BaseModel):
+    items: List[OrderItem]
+    vendor_id: Optional[str] = None
+
 class OrderResponse(BaseModel):
     order_id: str
     vendor_id: str
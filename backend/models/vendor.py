@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from typing import Optional
 
 class VendorLogin(BaseModel):
     phone: str
@@ -8,3 +9,5 @@ class VendorCreate(BaseModel):
     full_name: str
     phone: str
     password: str
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
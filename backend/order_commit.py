@@ -0,0 +1,227 @@
+import os
+import time
+from concurrent.futures import Future
+from datetime import datetime
+from threading import Condition, Thread
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+from database import inventory_collection, order_collection
+from facets import facet_index
+from pricing import price_index
+from price_compare import price_comparison
+from order_tasks import enqueue_order_side_effects
+import change_feed
+import http_cache
+
+# Group commit is opt-in: ORDER_GROUP_COMMIT=1 coalesces orders arriving
+# within ORDER_GROUP_COMMIT_WINDOW_MS into one insert_many and one bulk_write.
+GROUP_COMMIT_ENABLED = os.getenv("ORDER_GROUP_COMMIT", "0") == "1"
+GROUP_COMMIT_WINDOW_MS = float(os.getenv("ORDER_GROUP_COMMIT_WINDOW_MS", "5"))
+GROUP_COMMIT_MAX_BATCH = int(os.getenv("ORDER_GROUP_COMMIT_MAX_BATCH", "200"))
+
+# Commit result for an order that is stored but whose stock was not updated
+STOCK_PENDING = "pending"
+
+
+def refresh_indexes(doc: dict):
+    """Apply an updated inventory document to the in-memory indexes"""
+    if facet_index.loaded:
+        facet_index.upsert(doc)
+    if price_index.loaded:
+        price_index.upsert(doc)
+    if price_comparison.loaded:
+        price_comparison.upsert(doc)
+
+
+def commit_order(order_doc: dict):
+    """
+    Store one order and decrement stock for its lines (per-order path).
+    Returns None, or STOCK_PENDING if the order was stored but the stock
+    update failed.
+    """
+    order_collection.insert_one(order_doc)
+
+    # Update inventory stocks, stamp them for delta sync and keep the
+    # in-memory indexes in step
+    lines = order_doc["items"]
+    result = None
+    first_seq = None
+    try:
+        # Allocating sequence numbers is a write too; once the order is
+        # stored its failure must not reach the client either
+        first_seq = change_feed.allocate(len(lines))
+        for offset, line in enumerate(lines):
+            # The order's items are all in its region; naming it targets one shard
+            updated = inventory_collection.find_one_and_update(
+                {"_id": ObjectId(line["item_id"]), "region": order_doc["region"]},
+                {
+                    "$inc": {"stock": -line["quantity"]},
+                    "$set": {"change_seq": first_seq + offset, "last_updated": datetime.now()}
+                },
+                return_document=ReturnDocument.AFTER
+            )
+            if updated:
+                refresh_indexes(updated)
+    except Exception as e:
+        result = stock_update_failed([order_doc], e)
+    finally:
+        if first_seq is not None:
+            change_feed.release(first_seq, len(lines))
+    http_cache.bump("inventory", order_doc.get("region"))
+
+    # Notifications, low-stock checks and analytics run in the background
+    enqueue_order_side_effects([order_doc])
+    return result
+
+
+def stock_update_failed(order_docs: list, error: Exception) -> str:
+    """
+    The orders are stored but their stock decrement failed, possibly part
+    way. Retrying the request would duplicate the orders, so they are
+    reported as placed and flagged stock_update: "pending" for
+    reconciliation instead.
+    """
+    order_ids = [order_doc["order_id"] for order_doc in order_docs]
+    print(f"❌ Stock update failed for stored orders {', '.join(order_ids)}:", error)
+    try:
+        order_collection.update_many({"order_id": {"$in": order_ids}}, {"$set": {"stock_update": STOCK_PENDING}})
+    except Exception as e:
+        print("❌ Could not flag orders for stock reconciliation:", e)
+    return STOCK_PENDING
+
+
+class OrderBatcher:
+    """
+    Group commit for order placement. Request threads submit a validated
+    order document and wait on a Future; a single writer thread collects
+    everything submitted within the window and commits it with one
+    insert_many for the orders and one bulk_write for the stock
+    decrements, then resolves each Future on its own.
+    """
+
+    def __init__(self, window_ms: float = GROUP_COMMIT_WINDOW_MS, max_batch: int = GROUP_COMMIT_MAX_BATCH):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._pending = []
+        self._cond = Condition()
+        self._thread = None
+        self._running = False
+
+    def submit(self, order_doc: dict) -> Future:
+        future = Future()
+        with self._cond:
+            if not self._running:
+                raise RuntimeError("Order group commit is not running")
+            self._pending.append((order_doc, future))
+            self._cond.notify()
+        return future
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = Thread(target=self._run, name="order-group-commit", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop accepting orders and commit whatever is still queued"""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and not self._pending:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                # Give concurrent requests the window to join this batch
+                deadline = time.monotonic() + self.window
+                while self._running and len(self._pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+            self._commit(batch)
+
+    def _commit(self, batch: list):
+        try:
+            committed = self._insert_orders(batch)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        if not committed:
+            return
+
+        # The orders are stored from here on; whatever happens to the stock
+        # update, each request is told its order was placed
+        try:
+            result = self._decrement_stock([order_doc for order_doc, _ in committed])
+        except Exception as e:
+            result = stock_update_failed([order_doc for order_doc, _ in committed], e)
+        for _, future in committed:
+            future.set_result(result)
+
+    def _insert_orders(self, batch: list) -> list:
+        """insert_many the orders; fail only the futures whose insert failed"""
+        try:
+            order_collection.insert_many([order_doc for order_doc, _ in batch], ordered=False)
+        except BulkWriteError as e:
+            failed = {error["index"]: error for error in e.details.get("writeErrors", [])}
+            if e.details.get("writeConcernErrors") or not failed:
+                raise
+            for index, error in failed.items():
+                batch[index][1].set_exception(RuntimeError(error.get("errmsg", "Order insert failed")))
+            return [entry for index, entry in enumerate(batch) if index not in failed]
+        return batch
+
+    def _decrement_stock(self, order_docs: list):
+        lines = [line for order_doc in order_docs for line in order_doc["items"]]
+        result = None
+        first_seq = None
+        try:
+            first_seq = change_feed.allocate(len(lines))
+            now = datetime.now()
+            inventory_collection.bulk_write([
+                UpdateOne(
+                    {"_id": ObjectId(line["item_id"])},
+                    {
+                        "$inc": {"stock": -line["quantity"]},
+                        "$set": {"change_seq": first_seq + offset, "last_updated": now}
+                    }
+                )
+                for offset, line in enumerate(lines)
+            ], ordered=False)
+        except Exception as e:
+            result = stock_update_failed(order_docs, e)
+        finally:
+            if first_seq is not None:
+                change_feed.release(first_seq, len(lines))
+        for region in {order_doc.get("region") for order_doc in order_docs}:
+            http_cache.bump("inventory", region)
+
+        # The orders are committed at this point; a failure below must not
+        # be reported to the waiting requests.
+        try:
+            # bulk_write does not return documents; one read refreshes the indexes
+            item_ids = list({ObjectId(line["item_id"]) for line in lines})
+            for doc in inventory_collection.find({"_id": {"$in": item_ids}}):
+                refresh_indexes(doc)
+        except Exception as e:
+            print("❌ Could not refresh inventory indexes after group commit:", e)
+
+        enqueue_order_side_effects(order_docs)
+        return result
+
+
+order_batcher = OrderBatcher()
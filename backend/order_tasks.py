@@ -0,0 +1,95 @@
+from datetime import datetime
+from bson.objectid import ObjectId
+from pymongo.errors import DuplicateKeyError
+from database import inventory_collection, notification_collection, analytics_collection
+from jobs import job_queue
+
+# Items at or below this stock level trigger a low-stock notification
+LOW_STOCK_THRESHOLD = 20
+
+
+def enqueue_order_side_effects(order_docs: list):
+    """Queue everything that does not have to finish before place_order returns"""
+    jobs = []
+    for order_doc in order_docs:
+        payload = {
+            "order_id": order_doc["order_id"],
+            "vendor_id": order_doc["vendor_id"],
+            "total_amount": order_doc["total_amount"],
+            # Analytics bucket by the day the order was placed, not the day the job runs
+            "day": order_doc["created_at"].strftime("%Y-%m-%d"),
+            "item_ids": [line["item_id"] for line in order_doc["items"]],
+            "suppliers": sorted({line["supplier"] for line in order_doc["items"]})
+        }
+        jobs += [
+            ("order.notify", payload),
+            ("order.low_stock_check", payload),
+            ("order.analytics", payload)
+        ]
+    try:
+        job_queue.enqueue_many(jobs)
+    except Exception as e:
+        # The order itself is already stored; don't fail the request over this
+        print("❌ Could not queue order side effects:", e)
+
+
+@job_queue.handler("order.notify")
+def notify_order_placed(payload: dict):
+    """Notify the vendor and every supplier in the order"""
+    # Keyed on order + recipient so a retried job does not notify twice
+    recipients = [("vendor", payload["vendor_id"])] + [("supplier", name) for name in payload["suppliers"]]
+    for role, recipient in recipients:
+        notification_collection.update_one(
+            {"order_id": payload["order_id"], "type": "order_placed", "recipient": recipient},
+            {"$setOnInsert": {
+                "role": role,
+                "message": f"Order {payload['order_id']} placed (₹{payload['total_amount']})",
+                "read": False,
+                "created_at": datetime.utcnow()
+            }},
+            upsert=True
+        )
+
+
+@job_queue.handler("order.low_stock_check")
+def check_low_stock(payload: dict):
+    """Warn suppliers whose items dropped to the low-stock threshold"""
+    items = inventory_collection.find(
+        {
+            "_id": {"$in": [ObjectId(item_id) for item_id in payload["item_ids"]]},
+            "stock": {"$lte": LOW_STOCK_THRESHOLD}
+        },
+        {"name": 1, "stock": 1, "supplier": 1}
+    )
+    for item in items:
+        notification_collection.update_one(
+            {"order_id": payload["order_id"], "type": "low_stock", "item_id": str(item["_id"])},
+            {"$setOnInsert": {
+                "role": "supplier",
+                "recipient": item["supplier"],
+                "message": f"{item['name']} is running low ({item['stock']} left)",
+                "read": False,
+                "created_at": datetime.utcnow()
+            }},
+            upsert=True
+        )
+
+
+@job_queue.handler("order.analytics")
+def update_order_analytics(payload: dict):
+    """Roll the order into the daily totals"""
+    # Jobs queued before "day" was part of the payload fall back to today
+    day = payload.get("day") or datetime.utcnow().strftime("%Y-%m-%d")
+    try:
+        # Orders already counted do not match the filter, so a retried job
+        # falls through to the upsert and hits the unique index on date.
+        analytics_collection.update_one(
+            {"date": day, "orders": {"$ne": payload["order_id"]}},
+            {
+                "$addToSet": {"orders": payload["order_id"]},
+                "$inc": {"order_count": 1, "revenue": payload["total_amount"]}
+            },
+            upsert=True
+        )
+    except DuplicateKeyError:
+        pass
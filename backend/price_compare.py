@@ -0,0 +1,220 @@
+import re
+from bisect import insort
+from threading import Lock
+from regions import PerRegion
+
+# unit -> (base unit, base units per unit)
+UNITS = {
+    "kg": ("kg", 1), "kgs": ("kg", 1), "kilo": ("kg", 1), "kilogram": ("kg", 1),
+    "g": ("kg", 0.001), "gm": ("kg", 0.001), "gms": ("kg", 0.001), "gram": ("kg", 0.001),
+    "quintal": ("kg", 100),
+    "l": ("liter", 1), "ltr": ("liter", 1), "liter": ("liter", 1), "litre": ("liter", 1), "liters": ("liter", 1),
+    "ml": ("liter", 0.001),
+    "packet": ("packet", 1), "pack": ("packet", 1), "pkt": ("packet", 1), "packets": ("packet", 1),
+    "piece": ("piece", 1), "pieces": ("piece", 1), "pc": ("piece", 1), "pcs": ("piece", 1),
+    "dozen": ("piece", 12),
+}
+
+# Local and alternate names folded onto one canonical ingredient word
+ALIASES = {
+    "chawal": "rice", "atta": "flour", "maida": "flour", "tel": "oil",
+    "aloo": "potato", "pyaz": "onion", "pyaaz": "onion", "tamatar": "tomato",
+    "chili": "chilli", "chilly": "chilli", "mirch": "chilli",
+    "daal": "dal", "dhal": "dal",
+    "haldi": "turmeric", "dhania": "coriander", "jeera": "cumin", "pudina": "mint",
+}
+
+# Forms rather than ingredients: "Turmeric Powder" and "Red Chilli Powder"
+# must not be compared, so these keep the word before them in the key
+FORMS = {"powder", "leaf", "seed", "paste", "masala", "flake", "sauce", "pickle", "puree"}
+
+IRREGULAR_PLURALS = {"leaves": "leaf", "halves": "half"}
+
+_UNIT_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)?\s*([a-z]+)\s*$")
+
+
+def normalize_unit(unit: str):
+    """'kg' -> ('kg', 1), '500 g' -> ('kg', 0.5), unknown units -> (unit, 1)"""
+    match = _UNIT_PATTERN.match((unit or "").lower())
+    if not match:
+        return (unit or "").lower().strip(), 1
+    quantity, name = match.groups()
+    base, factor = UNITS.get(name, (name, 1))
+    return base, factor * float(quantity or 1)
+
+
+def _singular(word: str) -> str:
+    if word in IRREGULAR_PLURALS:
+        return IRREGULAR_PLURALS[word]
+    if word.endswith("oes"):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith("ss") and len(word) > 3:
+        return word[:-1]
+    return word
+
+
+def _words(name: str) -> list:
+    """Normalized name words, without pack sizes: 'Sugar 1kg' -> ['sugar']"""
+    return [
+        ALIASES.get(word, _singular(word))
+        for word in re.findall(r"[a-z]+", (name or "").lower())
+        if word not in UNITS
+    ]
+
+
+def canonical_name(name: str):
+    """
+    Split an item name into (ingredient, variety): the last word is the
+    ingredient, anything before it the variety. A trailing form word
+    (powder, leaves, ...) takes the word before it along.
+    'Basmati Rice' -> ('rice', 'basmati'), 'Red Chilli Powder' -> ('chilli powder', 'red')
+    """
+    words = _words(name)
+    if not words:
+        return "", ""
+    split = len(words) - 2 if len(words) > 1 and words[-1] in FORMS else len(words) - 1
+    return " ".join(words[split:]), " ".join(words[:split])
+
+
+def product_key(name: str) -> str:
+    """Normalized product name: 'Tomatoes' -> 'tomato', 'Basmati Chawal' -> 'basmati rice'"""
+    return " ".join(_words(name))
+
+
+def product_keys(name: str) -> list:
+    """
+    Keys a seller's product is matched on: the whole normalized name and
+    its ingredient, so a search for 'rice' finds 'Basmati Rice'
+    """
+    return sorted({product_key(name), canonical_name(name)[0]} - {""})
+
+
+class PriceComparisonIndex:
+    """
+    Offers grouped by (canonical ingredient, base unit), each group kept
+    sorted by price per base unit. Built in one batched pass at startup
+    and updated per item from inventory writes, so a comparison is a
+    dictionary lookup rather than a catalog scan.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._groups = {}  # ingredient -> base unit -> sorted [(price per unit, item id)]
+        self._offers = {}  # item id -> offer
+        self._by_word = {}  # name word -> {ingredient: offers using the word}
+        self.loaded = False
+
+    def load(self, docs):
+        offers = {}
+        groups = {}
+        by_word = {}
+        for doc in docs:
+            offer = _offer(doc)
+            offers[offer["id"]] = offer
+            ingredient, base_unit = offer["group"]
+            groups.setdefault(ingredient, {}).setdefault(base_unit, []).append((offer["price_per_unit"], offer["id"]))
+            for word in offer["words"]:
+                counts = by_word.setdefault(word, {})
+                counts[ingredient] = counts.get(ingredient, 0) + 1
+        for units in groups.values():
+            for entries in units.values():
+                entries.sort()
+        with self._lock:
+            self._offers, self._groups, self._by_word = offers, groups, by_word
+            self.loaded = True
+
+    def upsert(self, doc: dict):
+        offer = _offer(doc)
+        with self._lock:
+            self._discard(offer["id"])
+            self._offers[offer["id"]] = offer
+            ingredient, base_unit = offer["group"]
+            entries = self._groups.setdefault(ingredient, {}).setdefault(base_unit, [])
+            insort(entries, (offer["price_per_unit"], offer["id"]))
+            for word in offer["words"]:
+                counts = self._by_word.setdefault(word, {})
+                counts[ingredient] = counts.get(ingredient, 0) + 1
+
+    def remove(self, item_id: str):
+        with self._lock:
+            self._discard(item_id)
+
+    def compare(self, name: str, limit: int = 10, in_stock_only: bool = True) -> list:
+        """
+        Cheapest offers per unit for an ingredient, one list per ingredient
+        and base unit. A name that is not an ingredient of its own matches
+        the offers whose ingredient or variety contains all of its words,
+        so 'turmeric' finds turmeric powder and 'basmati' basmati rice.
+        """
+        ingredient, _ = canonical_name(name)
+        words = set(_words(name))
+        with self._lock:
+            if ingredient in self._groups:
+                ingredients, wanted = [ingredient], None
+            elif words:
+                ingredients = set.intersection(*(set(self._by_word.get(word, ())) for word in words))
+                wanted = words
+            else:
+                ingredients = []
+            result = []
+            for key in ingredients:
+                for base_unit, entries in self._groups[key].items():
+                    offers = []
+                    for _, item_id in entries:
+                        offer = self._offers[item_id]
+                        if in_stock_only and offer["stock"] <= 0:
+                            continue
+                        if wanted and not wanted <= offer["words"]:
+                            continue
+                        offers.append({k: value for k, value in offer.items() if k not in ("group", "words")})
+                        if len(offers) >= limit:
+                            break
+                    if offers:
+                        result.append({"ingredient": key, "unit": base_unit, "offers": offers})
+        # Most offers first; each list is already cheapest first
+        result.sort(key=lambda group: -len(group["offers"]))
+        return result
+
+    def _discard(self, item_id: str):
+        offer = self._offers.pop(item_id, None)
+        if offer is None:
+            return
+        ingredient, base_unit = offer["group"]
+        units = self._groups[ingredient]
+        units[base_unit].remove((offer["price_per_unit"], item_id))
+        if not units[base_unit]:
+            del units[base_unit]
+            if not units:
+                del self._groups[ingredient]
+        for word in offer["words"]:
+            counts = self._by_word[word]
+            counts[ingredient] -= 1
+            if not counts[ingredient]:
+                del counts[ingredient]
+                if not counts:
+                    del self._by_word[word]
+
+
+def _offer(doc: dict) -> dict:
+    ingredient, variety = canonical_name(doc["name"])
+    base_unit, factor = normalize_unit(doc["unit"])
+    return {
+        "id": str(doc["_id"]),
+        "name": doc["name"],
+        "variety": variety,
+        "supplier": doc["supplier"],
+        "price": doc["price"],
+        "unit": doc["unit"],
+        "price_per_unit": round(doc["price"] / factor, 4) if factor else doc["price"],
+        "stock": doc.get("stock", 0),
+        "min_order_quantity": doc.get("min_order_quantity", 1),
+        "group": (ingredient, base_unit),
+        "words": frozenset(_words(doc["name"]))
+    }
+
+
+# Projection used when (re)loading the index from MongoDB
+COMPARE_FIELDS = {"name": 1, "price": 1, "unit": 1, "stock": 1, "supplier": 1, "min_order_quantity": 1, "region": 1}
+
+# Offers are compared within a city; read with price_comparison.for_region(region)
+price_comparison = PerRegion(PriceComparisonIndex)
@@ -0,0 +1,100 @@
+from threading import Lock
+from bson.objectid import ObjectId
+from regions import DEFAULT_REGION
+
+
+class LineError(Exception):
+    """A cart line that cannot be ordered; carries the HTTP status place_order uses"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def price_line(item, inventory_item, region: str = None) -> dict:
+    """
+    Validate one order line against its inventory record and price it.
+    Shared by place_order (records from MongoDB) and the quote endpoint
+    (records from the in-memory price index). With a region, items from
+    other regions are rejected, since an order stays within one region.
+    """
+    if not ObjectId.is_valid(item.item_id):
+        raise LineError(400, f"Invalid item ID: {item.item_id}")
+
+    if not inventory_item:
+        raise LineError(404, f"Item not found: {item.item_id}")
+
+    if region and inventory_item.get("region", region) != region:
+        raise LineError(400, f"{inventory_item['name']} is not available in {region}")
+
+    if inventory_item["stock"] < item.quantity:
+        raise LineError(
+            400,
+            f"Insufficient stock for {inventory_item['name']}. Available: {inventory_item['stock']}, Requested: {item.quantity}"
+        )
+
+    min_quantity = inventory_item.get("min_order_quantity", 1)
+    if item.quantity < min_quantity:
+        raise LineError(400, f"Minimum order quantity for {inventory_item['name']} is {min_quantity}")
+
+    return {
+        "item_id": item.item_id,
+        "name": inventory_item["name"],
+        "price": inventory_item["price"],
+        "quantity": item.quantity,
+        "unit": inventory_item["unit"],
+        "total": inventory_item["price"] * item.quantity,
+        "supplier": inventory_item["supplier"]
+    }
+
+
+# Fields kept per item; also the projection used to load the index
+PRICE_FIELDS = {"name": 1, "price": 1, "stock": 1, "unit": 1, "supplier": 1, "min_order_quantity": 1, "region": 1}
+
+
+class PriceIndex:
+    """
+    item id -> price, stock and minimum order quantity, kept in memory and
+    updated from the same inventory writes as the facet index, so carts
+    can be quoted without a database round trip.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._items = {}
+        self.loaded = False
+
+    def load(self, docs):
+        items = {str(doc["_id"]): _entry(doc) for doc in docs}
+        with self._lock:
+            self._items = items
+            self.loaded = True
+
+    def upsert(self, doc: dict):
+        entry = _entry(doc)
+        with self._lock:
+            self._items[str(doc["_id"])] = entry
+
+    def remove(self, item_id: str):
+        with self._lock:
+            self._items.pop(item_id, None)
+
+    def get(self, item_id: str):
+        # Entries are replaced, never mutated, so a plain dict read is safe
+        return self._items.get(item_id)
+
+
+def _entry(doc: dict) -> dict:
+    return {
+        "name": doc["name"],
+        "price": doc["price"],
+        "stock": doc["stock"],
+        "unit": doc["unit"],
+        "supplier": doc["supplier"],
+        "min_order_quantity": doc.get("min_order_quantity", 1),
+        "region": doc.get("region", DEFAULT_REGION)
+    }
+
+
+price_index = PriceIndex()
@@ -0,0 +1,343 @@
+import asyncio
+import hmac
+import os
+import random
+import sys
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from datetime import datetime
+from itertools import count
+from threading import Condition, Thread, get_ident
+from pymongo import monitoring
+from fastapi.routing import APIRoute
+
+# Profiling is off unless PROFILE_TOKEN is set. The token authorises the
+# X-Profile request header and the /debug/profile* admin endpoints.
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+# Requests slower than this are captured automatically (0 disables)
+SLOW_REQUEST_MS = float(os.getenv("PROFILE_SLOW_REQUEST_MS", "0"))
+SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5")) / 1000
+MAX_CAPTURES = 50
+MAX_COMMANDS = 200
+
+# The request being traced in the current context. Starlette copies the
+# context into threadpool workers, so the Mongo listener sees it too.
+_current = ContextVar("profiled_request", default=None)
+
+
+class RequestTrace:
+    """Samples and Mongo commands collected for one in-flight request"""
+
+    def __init__(self, scope: dict, sampled: bool, forced: bool):
+        self.id = None
+        self.scope = scope
+        self.sampled = sampled
+        self.forced = forced
+        self.started = time.monotonic()
+        self.started_at = datetime.utcnow()
+        self.status = None
+        self.samples = Counter()
+        self.commands = []
+        self.thread = None
+        self.root = None  # frame the endpoint runs under, set by bind()
+        self._pending = {}
+
+    def bind(self, frame):
+        """Called from the thread about to run the endpoint, with the frame calling it"""
+        self.thread = get_ident()
+        self.root = frame
+
+    def route(self) -> str:
+        route = self.scope.get("route")
+        if route is not None:
+            return route.path
+        endpoint = self.scope.get("endpoint")
+        return endpoint.__name__ if endpoint else self.scope["path"]
+
+
+class Profiler:
+    """
+    Stack-sampling profiler for request handlers. A sampler thread reads
+    sys._current_frames() every SAMPLE_INTERVAL and, for each request
+    being profiled, keeps the stack of the thread running that request's
+    endpoint if it passes through the frame the endpoint was called from
+    (see bind_endpoints), trimmed to start at the endpoint. Other requests
+    running the same endpoint concurrently are never counted. Stacks are
+    aggregated as folded lines ("outer;inner count") that flamegraph.pl
+    and speedscope read directly.
+
+    A request is profiled when it carries a valid X-Profile header, when
+    its route is a profiling target and it falls in the sampled fraction,
+    or when a slow-request threshold is set (the capture is then kept only
+    if the request turns out slow). With none of these active the
+    middleware is a single check per request.
+    """
+
+    def __init__(self, slow_ms: float = SLOW_REQUEST_MS, interval: float = SAMPLE_INTERVAL):
+        self.slow_ms = slow_ms
+        self.interval = interval
+        self.targets = {}  # route path -> {"pattern", "rate", "until", "requests", "samples"}
+        self.captures = deque(maxlen=MAX_CAPTURES)
+        self._active = {}
+        self._ids = count(1)
+        self._cond = Condition()
+        self._thread = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(PROFILE_TOKEN)
+
+    def start(self):
+        if not self.enabled or self._thread:
+            return
+        self._thread = Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            thread, self._thread = self._thread, None
+            self._cond.notify()
+        if thread:
+            thread.join()
+
+    def profile_route(self, route: str, pattern, rate: float, duration_s: float):
+        """
+        Sample `rate` of the requests to a route for the next duration_s
+        seconds. `pattern` is the route's compiled path regex.
+        """
+        with self._cond:
+            self.targets[route] = {
+                "pattern": pattern,
+                "rate": rate,
+                "until": time.monotonic() + duration_s,
+                "requests": 0,
+                "samples": Counter()
+            }
+
+    def clear_route(self, route: str = None):
+        with self._cond:
+            if route is None:
+                self.targets.clear()
+            else:
+                self.targets.pop(route, None)
+
+    def begin(self, scope: dict, forced: bool):
+        """Start tracing a request if anything asks for it, else return None"""
+        targeted = self._targeted(scope)
+        if not (forced or targeted or self.slow_ms):
+            return None
+        sampled = any(random.random() < rate for rate in targeted)
+        trace = RequestTrace(scope, sampled, forced)
+        trace.id = next(self._ids)
+        with self._cond:
+            self._active[trace.id] = trace
+            self._cond.notify()
+        return trace
+
+    def finish(self, trace: RequestTrace):
+        duration_ms = (time.monotonic() - trace.started) * 1000
+        route = trace.route()
+
+        with self._cond:
+            self._active.pop(trace.id, None)
+            trace.root = None
+            target = self.targets.get(route)
+            if target is not None and trace.sampled:
+                target["requests"] += 1
+                target["samples"].update(trace.samples)
+
+        if trace.forced or (self.slow_ms and duration_ms >= self.slow_ms):
+            self.captures.append({
+                "id": trace.id,
+                "method": trace.scope["method"],
+                "path": trace.scope["path"],
+                "route": route,
+                "status": trace.status,
+                "duration_ms": round(duration_ms, 2),
+                "started_at": trace.started_at.isoformat(),
+                "reason": "header" if trace.forced else "slow",
+                "sample_interval_ms": self.interval * 1000,
+                "samples": sum(trace.samples.values()),
+                "folded": folded(trace.samples),
+                "mongo_commands": trace.commands
+            })
+
+    def capture(self, capture_id: int):
+        return next((capture for capture in self.captures if capture["id"] == capture_id), None)
+
+    def status(self) -> dict:
+        now = time.monotonic()
+        return {
+            "slow_request_ms": self.slow_ms,
+            "sample_interval_ms": self.interval * 1000,
+            "in_flight": len(self._active),
+            "captures": len(self.captures),
+            "targets": {
+                route: {
+                    "rate": target["rate"],
+                    "remaining_s": max(round(target["until"] - now, 1), 0),
+                    "requests": target["requests"],
+                    "samples": sum(target["samples"].values())
+                }
+                for route, target in self.targets.items()
+            }
+        }
+
+    def _targeted(self, scope: dict) -> list:
+        """Sampling rates of the active targets whose path matches this request"""
+        if not self.targets:
+            return []
+        now = time.monotonic()
+        return [
+            target["rate"]
+            for target in list(self.targets.values())
+            if target["until"] >= now and target["pattern"].match(scope["path"])
+        ]
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._thread and not self._active:
+                    self._cond.wait()
+                if not self._thread:
+                    return
+                # Sampling holds the lock so finish() never reads a
+                # Counter that is still being written
+                traces = [trace for trace in self._active.values() if trace.forced or trace.sampled or self.slow_ms]
+                if traces:
+                    frames = sys._current_frames()
+                    for trace in traces:
+                        self._sample(trace, frames)
+                    del frames
+            time.sleep(self.interval)
+
+    def _sample(self, trace: RequestTrace, frames: dict):
+        # Nothing to attribute until the endpoint has started
+        root = trace.root
+        if root is None:
+            return
+        frame = frames.get(trace.thread)
+        stack = _stack_below(frame, root)
+        if stack:
+            trace.samples[stack] += 1
+
+
+def _stack_below(frame, root) -> tuple:
+    """Frame labels from just below root down to the leaf, or () if root is not on the stack"""
+    labels = []
+    while frame is not None:
+        if frame is root:
+            return tuple(reversed(labels))
+        labels.append(f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ()
+
+
+def bind_endpoints(app):
+    """
+    Wrap every route's endpoint call so a profiled request records the
+    thread and frame its endpoint runs under. Call after all routers are
+    included.
+    """
+    for route in app.routes:
+        if isinstance(route, APIRoute) and not getattr(route.dependant.call, "profiled", False):
+            route.dependant.call = _bound(route.dependant.call)
+
+
+def _bound(call):
+    # FastAPI decided at startup whether to await the endpoint or run it
+    # in the threadpool, so the wrapper must keep its kind
+    if asyncio.iscoroutinefunction(call):
+        async def bound(**values):
+            trace = _current.get()
+            if trace is not None:
+                trace.bind(sys._getframe())
+            return await call(**values)
+    else:
+        def bound(**values):
+            trace = _current.get()
+            if trace is not None:
+                trace.bind(sys._getframe())
+            return call(**values)
+    bound.profiled = True
+    return bound
+
+
+def folded(samples: Counter) -> str:
+    """Collapsed-stack text, one 'frame;frame;frame count' line per stack"""
+    return "\n".join(f"{';'.join(stack)} {hits}" for stack, hits in samples.most_common())
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Record the Mongo commands issued while a traced request is running"""
+
+    def started(self, event):
+        trace = _current.get()
+        if trace is None:
+            return
+        target = event.command.get(event.command_name)
+        trace._pending[event.request_id] = {
+            "command": event.command_name,
+            "collection": target if isinstance(target, str) else None,
+            "database": event.database_name,
+            "at_ms": round((time.monotonic() - trace.started) * 1000, 2)
+        }
+
+    def succeeded(self, event):
+        self._finish(event, True)
+
+    def failed(self, event):
+        self._finish(event, False)
+
+    def _finish(self, event, ok: bool):
+        trace = _current.get()
+        if trace is None:
+            return
+        command = trace._pending.pop(event.request_id, None)
+        if command is None or len(trace.commands) >= MAX_COMMANDS:
+            return
+        command["duration_ms"] = event.duration_micros / 1000
+        command["ok"] = ok
+        trace.commands.append(command)
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that opens a RequestTrace for requests being profiled"""
+
+    def __init__(self, app, profiler: "Profiler"):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.profiler.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        forced = False
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                forced = hmac.compare_digest(value, PROFILE_TOKEN.encode())
+                break
+        trace = self.profiler.begin(scope, forced)
+        if trace is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                trace.status = message["status"]
+                if forced:
+                    message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", str(trace.id).encode())]
+            await send(message)
+
+        token = _current.set(trace)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _current.reset(token)
+            self.profiler.finish(trace)
+
+
+mongo_listener = MongoCommandListener()
+profiler = Profiler()
@@ -0,0 +1,164 @@
+import os
+from contextvars import ContextVar
+from threading import Lock
+from urllib.parse import parse_qs
+from starlette.responses import JSONResponse
+from geo import haversine_km
+
+# Cities served, keyed by region code. Vendors, sellers, inventory and
+# orders carry a `region` field with one of these codes; it prefixes
+# every partitioned index and is the shard key's leading field, so a
+# city's queries only touch that city's data.
+REGIONS = {
+    "mumbai": {"name": "Mumbai", "latitude": 19.076, "longitude": 72.8777, "aliases": ["bombay", "thane", "navi mumbai"]},
+    "delhi": {"name": "Delhi NCR", "latitude": 28.6139, "longitude": 77.209, "aliases": ["new delhi", "ncr", "gurgaon", "gurugram", "noida"]},
+    "bengaluru": {"name": "Bengaluru", "latitude": 12.9716, "longitude": 77.5946, "aliases": ["bangalore"]},
+    "hyderabad": {"name": "Hyderabad", "latitude": 17.385, "longitude": 78.4867, "aliases": ["secunderabad"]},
+    "chennai": {"name": "Chennai", "latitude": 13.0827, "longitude": 80.2707, "aliases": ["madras"]},
+    "kolkata": {"name": "Kolkata", "latitude": 22.5726, "longitude": 88.3639, "aliases": ["calcutta", "howrah"]},
+    "pune": {"name": "Pune", "latitude": 18.5204, "longitude": 73.8567, "aliases": ["pimpri-chinchwad"]},
+    "ahmedabad": {"name": "Ahmedabad", "latitude": 23.0225, "longitude": 72.5714, "aliases": ["gandhinagar"]},
+}
+
+# Region for requests that do not name one and for data written before
+# partitioning
+DEFAULT_REGION = os.getenv("DEFAULT_REGION", "mumbai")
+# A location further than this from every city centre belongs to the default region
+REGION_RADIUS_KM = float(os.getenv("REGION_RADIUS_KM", "120"))
+
+_ALIASES = {alias: code for code, region in REGIONS.items() for alias in [code, region["name"].lower(), *region["aliases"]]}
+
+# Region of the request being handled, set by RegionMiddleware
+_region = ContextVar("region", default=None)
+
+
+def normalize_region(value: str) -> str:
+    """'Bangalore' -> 'bengaluru'; raises ValueError for unknown cities"""
+    code = _ALIASES.get((value or "").strip().lower())
+    if code is None:
+        raise ValueError(f"Unknown region: {value}. Must be one of: {', '.join(REGIONS)}")
+    return code
+
+
+def region_for_point(latitude, longitude) -> str:
+    """Nearest served city to a location, or the default region"""
+    if latitude is None or longitude is None:
+        return current_region()
+    distance, code = min(
+        (haversine_km(latitude, longitude, region["latitude"], region["longitude"]), code)
+        for code, region in REGIONS.items()
+    )
+    return code if distance <= REGION_RADIUS_KM else DEFAULT_REGION
+
+
+def current_region() -> str:
+    """Region the current request is routed to (DEFAULT_REGION if it named none)"""
+    return _region.get() or DEFAULT_REGION
+
+
+def requested_region():
+    """Region the current request named explicitly, else None (admin views span all regions)"""
+    return _region.get()
+
+
+def scoped(query: dict, region: str = None) -> dict:
+    """Restrict a filter to one region's partition"""
+    return {**query, "region": region or current_region()}
+
+
+class RegionMiddleware:
+    """
+    Route each request to a partition: the X-Region header, or a
+    ?region= query parameter, names the city. Unknown cities get a 400.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        value = None
+        for name, header in scope["headers"]:
+            if name == b"x-region":
+                value = header.decode()
+                break
+        if value is None and b"region=" in scope["query_string"]:
+            value = parse_qs(scope["query_string"].decode()).get("region", [None])[0]
+
+        region = None
+        if value:
+            try:
+                region = normalize_region(value)
+            except ValueError as e:
+                await JSONResponse({"detail": str(e)}, status_code=400)(scope, receive, send)
+                return
+
+        token = _region.set(region)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _region.reset(token)
+
+
+class PerRegion:
+    """
+    One in-memory index per region behind the load/upsert/remove interface
+    the single indexes have. Documents are routed by their `region` field;
+    for_region() returns the index a request should read.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._lock = Lock()
+        self._by_region = {}
+        self._region_of = {}  # item id -> region
+        self.loaded = False
+
+    def load(self, docs):
+        groups = {}
+        for doc in docs:
+            groups.setdefault(doc.get("region", DEFAULT_REGION), []).append(doc)
+        by_region = {}
+        region_of = {}
+        for region, group in groups.items():
+            by_region[region] = self._new()
+            by_region[region].load(group)
+            region_of.update((str(doc["_id"]), region) for doc in group)
+        with self._lock:
+            self._by_region, self._region_of = by_region, region_of
+            self.loaded = True
+
+    def upsert(self, doc: dict):
+        item_id = str(doc["_id"])
+        region = doc.get("region", DEFAULT_REGION)
+        with self._lock:
+            previous = self._region_of.get(item_id)
+            self._region_of[item_id] = region
+        if previous is not None and previous != region:
+            self._by_region[previous].remove(item_id)
+        self.for_region(region).upsert(doc)
+
+    def remove(self, item_id: str):
+        with self._lock:
+            region = self._region_of.pop(item_id, None)
+        if region is not None:
+            self._by_region[region].remove(item_id)
+
+    def for_region(self, region: str):
+        with self._lock:
+            index = self._by_region.get(region)
+            if index is None:
+                index = self._by_region[region] = self._new()
+            return index
+
+    def regions(self) -> list:
+        with self._lock:
+            return list(self._by_region)
+
+    def _new(self):
+        index = self._factory()
+        index.load([])
+        return index
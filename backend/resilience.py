@@ -0,0 +1,250 @@
+import os
+import random
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from threading import Lock
+import pymongo
+from pymongo.errors import ConnectionFailure, PyMongoError
+from fastapi import HTTPException
+
+# Total time a request may spend; each Mongo operation gets what is left,
+# capped at OPERATION_TIMEOUT_MS. Clients may ask for less with
+# X-Request-Budget-Ms (e.g. the Next.js proxy passing on its own deadline),
+# but not less than MIN_REQUEST_BUDGET_MS.
+REQUEST_BUDGET_MS = float(os.getenv("REQUEST_BUDGET_MS", "8000"))
+MIN_REQUEST_BUDGET_MS = float(os.getenv("MIN_REQUEST_BUDGET_MS", "500"))
+OPERATION_TIMEOUT_MS = float(os.getenv("MONGO_OPERATION_TIMEOUT_MS", "3000"))
+READ_RETRIES = int(os.getenv("MONGO_READ_RETRIES", "2"))
+RETRY_BASE_MS = 50
+RETRY_MAX_MS = 500
+# The breaker opens after this many consecutive transient failures and
+# lets one trial operation through once BREAKER_RESET_S has passed
+BREAKER_FAILURES = int(os.getenv("MONGO_BREAKER_FAILURES", "5"))
+BREAKER_RESET_S = float(os.getenv("MONGO_BREAKER_RESET_S", "15"))
+STALE_CACHE_ENTRIES = int(os.getenv("STALE_CACHE_ENTRIES", "128"))
+
+
+class DatabaseUnavailable(HTTPException):
+    """503 raised instead of waiting on a database that is down or too slow"""
+
+    def __init__(self, detail: str, retry_after: float = 1):
+        super().__init__(status_code=503, detail=detail, headers={"Retry-After": str(max(int(retry_after), 1))})
+
+
+class RequestBudget:
+    def __init__(self, budget_ms: float):
+        self.deadline = time.monotonic() + budget_ms / 1000
+        self.stale = False
+
+    def remaining(self) -> float:
+        return self.deadline - time.monotonic()
+
+
+# Budget of the request being handled. Starlette copies the context into
+# threadpool workers; reads outside a request get OPERATION_TIMEOUT_MS.
+_budget = ContextVar("request_budget", default=None)
+
+
+def remaining() -> float:
+    """Seconds the next Mongo operation may take"""
+    budget = _budget.get()
+    cap = OPERATION_TIMEOUT_MS / 1000
+    return cap if budget is None else min(budget.remaining(), cap)
+
+
+def is_transient(error: PyMongoError) -> bool:
+    """Network errors and timeouts; not duplicate keys, validation and the like"""
+    return isinstance(error, ConnectionFailure) or error.timeout
+
+
+class CircuitBreaker:
+    """
+    Closed: operations run normally. Open: they fail immediately for
+    reset_after seconds. Half-open: one trial operation decides whether
+    to close again or stay open for another period.
+    """
+
+    def __init__(self, name: str, failures: int = BREAKER_FAILURES, reset_after: float = BREAKER_RESET_S):
+        self.name = name
+        self.failures = failures
+        self.reset_after = reset_after
+        self.state = "closed"
+        self._consecutive = 0
+        self._opened_at = 0
+        self._trial = False
+        self._lock = Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_after:
+                self.state = "half_open"
+                self._trial = False
+            if self.state == "half_open" and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def is_open(self) -> bool:
+        """Open and not yet due for a trial; does not take the trial slot"""
+        return self.state == "open" and time.monotonic() - self._opened_at < self.reset_after
+
+    def retry_after(self) -> float:
+        return max(self._opened_at + self.reset_after - time.monotonic(), 1)
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                print(f"✅ Mongo circuit '{self.name}' closed")
+            self.state = "closed"
+            self._consecutive = 0
+
+    def release(self):
+        """Give back a half-open trial whose outcome says nothing about the database"""
+        with self._lock:
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive += 1
+            if self.state == "half_open" or (self.state == "closed" and self._consecutive >= self.failures):
+                if self.state == "closed":
+                    print(f"❌ Mongo circuit '{self.name}' opened after {self._consecutive} failures")
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+    def status(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self._consecutive}
+
+
+class StaleCache:
+    """Last good result per read, served only while the database is unreachable"""
+
+    def __init__(self, max_entries: int = STALE_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            return self._entries.get(key)
+
+
+breakers = {"oltp": CircuitBreaker("oltp"), "analytics": CircuitBreaker("analytics")}
+stale_cache = StaleCache()
+
+
+def ensure_available(workload: str = "oltp"):
+    """Fail fast with 503 while the workload's circuit is open"""
+    breaker = breakers[workload]
+    if breaker.is_open():
+        raise DatabaseUnavailable("Database temporarily unavailable", breaker.retry_after())
+
+
+def read(operation, cache_key=None, workload: str = "oltp"):
+    """
+    Run an idempotent read (a callable that also drains any cursor) under
+    the request deadline. Transient failures are retried with full-jitter
+    backoff while budget remains. When the circuit is open or retries run
+    out, the last good result for cache_key is returned and the response
+    is marked stale; without one, DatabaseUnavailable is raised. Timeouts
+    of operations cut short by the request's own budget do not count
+    towards the breaker.
+    """
+    breaker = breakers[workload]
+    attempt = 0
+    while True:
+        timeout = remaining()
+        if timeout <= 0:
+            return _stale_or_raise(cache_key, "Request deadline exceeded")
+        if not breaker.allow():
+            return _stale_or_raise(cache_key, "Database temporarily unavailable", breaker.retry_after())
+
+        try:
+            with pymongo.timeout(timeout):
+                result = operation()
+        except PyMongoError as e:
+            if not is_transient(e):
+                # The server answered; this is the caller's problem
+                breaker.record_success()
+                raise
+            if e.timeout and timeout < OPERATION_TIMEOUT_MS / 1000:
+                # Ran out of the caller's budget, not the operation's
+                breaker.release()
+            else:
+                breaker.record_failure()
+            attempt += 1
+            delay = random.uniform(0, min(RETRY_MAX_MS, RETRY_BASE_MS * 2 ** attempt)) / 1000
+            if attempt > READ_RETRIES or delay >= remaining():
+                return _stale_or_raise(cache_key, f"Database error: {e}")
+            time.sleep(delay)
+            continue
+        except Exception:
+            # Not a database failure; do not leave a half-open trial hanging
+            breaker.record_success()
+            raise
+
+        breaker.record_success()
+        if cache_key is not None:
+            stale_cache.put(cache_key, result)
+        return result
+
+
+def _stale_or_raise(cache_key, detail: str, retry_after: float = 1):
+    entry = stale_cache.get(cache_key) if cache_key is not None else None
+    if entry is None:
+        raise DatabaseUnavailable(detail, retry_after)
+    budget = _budget.get()
+    if budget is not None:
+        budget.stale = True
+    return entry[0]
+
+
+class DeadlineMiddleware:
+    """
+    Gives each request a time budget for its Mongo operations, and keeps
+    responses built from stale cache out of HTTP caches.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        budget_ms = REQUEST_BUDGET_MS
+        for name, value in scope["headers"]:
+            if name == b"x-request-budget-ms":
+                try:
+                    budget_ms = min(max(float(value), MIN_REQUEST_BUDGET_MS), REQUEST_BUDGET_MS)
+                except ValueError:
+                    pass
+                break
+        budget = RequestBudget(budget_ms)
+
+        async def send_marked(message):
+            if message["type"] == "http.response.start" and budget.stale:
+                headers = [
+                    (name, value) for name, value in message.get("headers", [])
+                    if name.lower() not in (b"etag", b"last-modified", b"cache-control")
+                ]
+                headers += [(b"cache-control", b"no-store"), (b"warning", b'110 - "Response is Stale"')]
+                message["headers"] = headers
+            await send(message)
+
+        token = _budget.set(budget)
+        try:
+            await self.app(scope, receive, send_marked)
+        finally:
+            _budget.reset(token)
@@ -2,6 +2,8 @@ from fastapi import APIRouter, HTTPException
 from models.vendor import VendorLogin, VendorCreate
 from database import vendor_collection
 from bson.objectid import ObjectId
+from geo import to_point
+from regions import region_for_point
 import hashlib
 
 router = APIRouter()
@@ -14,11 +16,21 @@ def register_vendor(data: VendorCreate):
     if vendor_collection.find_one({"phone": data.phone}):
         raise HTTPException(status_code=400, detail="Phone number already exists")
 
-    vendor_collection.insert_one({
+    try:
+        location = to_point(data.latitude, data.longitude)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    vendor = {
         "full_name": data.full_name,
         "phone": data.phone,
-        "password": hash_password(data.password)
-    })
+        "password": hash_password(data.password),
+        # Orders are placed in the vendor's region
+        "region": region_for_point(data.latitude, data.longitude)
+    }
+    if location:
+        vendor["location"] = location
+    vendor_collection.insert_one(vendor)
     return {"msg": "Vendor registered successfully"}
 
 @router.post("/vendor/login")
@@ -0,0 +1,81 @@
+import hmac
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
+from fastapi.routing import APIRoute
+from profiling import profiler, folded, PROFILE_TOKEN
+
+router = APIRouter()
+
+
+def check_token(request: Request):
+    """Profiling endpoints exist only when PROFILE_TOKEN is set and sent as X-Profile-Token"""
+    sent = request.headers.get("x-profile-token", "")
+    if not PROFILE_TOKEN or not hmac.compare_digest(sent.encode(), PROFILE_TOKEN.encode()):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+@router.get("/debug/profile")
+def profile_status(request: Request):
+    """Active profiling targets and the slow-request threshold"""
+    check_token(request)
+    return profiler.status()
+
+
+@router.post("/debug/profile")
+def start_route_profile(
+    request: Request,
+    route: str = Query(..., description="Route path as declared, e.g. /orders/place or /orders/{order_id}"),
+    rate: float = Query(0.1, gt=0, le=1, description="Fraction of the route's requests to sample"),
+    duration: float = Query(300, gt=0, le=3600, description="Seconds to keep profiling")
+):
+    """Sample a fraction of the requests to a route for a while"""
+    check_token(request)
+    match = next((r for r in request.app.routes if isinstance(r, APIRoute) and r.path == route), None)
+    if match is None:
+        raise HTTPException(status_code=404, detail=f"Unknown route: {route}")
+    profiler.profile_route(route, match.path_regex, rate, duration)
+    return {"message": f"Profiling {rate:.0%} of {route} for {duration:.0f}s", **profiler.status()}
+
+
+@router.delete("/debug/profile")
+def stop_route_profile(request: Request, route: str = Query(None, description="Route to stop; all when omitted")):
+    check_token(request)
+    profiler.clear_route(route)
+    return profiler.status()
+
+
+@router.put("/debug/profile/slow-threshold")
+def set_slow_threshold(request: Request, ms: float = Query(..., ge=0, description="Capture requests slower than this; 0 disables")):
+    check_token(request)
+    profiler.slow_ms = ms
+    return profiler.status()
+
+
+@router.get("/debug/profile/folded", response_class=PlainTextResponse)
+def route_flamegraph(request: Request, route: str = Query(..., description="Profiled route path")):
+    """Aggregated samples for a route in collapsed-stack format (flamegraph.pl, speedscope)"""
+    check_token(request)
+    target = profiler.targets.get(route)
+    if target is None:
+        raise HTTPException(status_code=404, detail=f"Route is not being profiled: {route}")
+    return folded(target["samples"])
+
+
+@router.get("/debug/profiles")
+def list_captures(request: Request):
+    """Captured slow and X-Profile requests, newest first, without their stacks"""
+    check_token(request)
+    return [
+        {key: value for key, value in capture.items() if key not in ("folded", "mongo_commands")}
+        for capture in reversed(profiler.captures)
+    ]
+
+
+@router.get("/debug/profiles/{capture_id}")
+def get_capture(request: Request, capture_id: int):
+    """One capture: collapsed stacks and the Mongo commands the request issued"""
+    check_token(request)
+    capture = profiler.capture(capture_id)
+    if capture is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return capture
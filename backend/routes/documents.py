@@ -0,0 +1,286 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from gridfs import GridFSBucket
+from gridfs.errors import NoFile
+from bson.objectid import ObjectId
+from datetime import datetime
+from urllib.parse import quote
+from database import db, seller_collection
+from event_log import event_log
+import hashlib
+import hmac
+import http_cache
+import os
+import re
+import secrets
+
+router = APIRouter()
+
+# KYC documents live in GridFS, written chunk by chunk as the upload
+# arrives so a request never holds a whole file in memory.
+document_bucket = GridFSBucket(db, bucket_name="seller_documents")
+
+DOCUMENT_KINDS = ["aadhar", "pan", "bank"]
+ALLOWED_CONTENT_TYPES = ["application/pdf", "image/jpeg", "image/png"]
+MAX_DOCUMENT_BYTES = 10 * 1024 * 1024
+GRIDFS_CHUNK_BYTES = 255 * 1024
+# Request chunks are collected up to this size before each GridFS write,
+# which runs in the threadpool
+WRITE_BUFFER_BYTES = 1024 * 1024
+READ_CHUNK_BYTES = 256 * 1024
+# KYC documents are readable only by the admin panel, which sends this
+# token as X-Admin-Token. Uploads also accept the seller's own upload token
+# (X-Upload-Token, issued by /seller/register) until the seller is approved.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+MAX_FILENAME_LENGTH = 255
+
+
+def is_admin(request: Request) -> bool:
+    token = request.headers.get("x-admin-token", "")
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+
+def check_admin_token(request: Request):
+    """Seller ids are public (listings, nearby suppliers), so they cannot guard documents"""
+    if not is_admin(request):
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+
+def issue_upload_token():
+    """New seller upload token and the hash stored in its place: (token, token_hash)"""
+    token = secrets.token_urlsafe(32)
+    return token, hash_upload_token(token)
+
+
+def hash_upload_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def check_upload_access(request: Request, seller: dict):
+    """The admin panel, or the seller itself with its upload token while not yet approved"""
+    if is_admin(request):
+        return
+    token = request.headers.get("x-upload-token", "")
+    stored = seller.get("upload_token_hash", "")
+    if not token or not stored or not hmac.compare_digest(hash_upload_token(token), stored):
+        raise HTTPException(status_code=403, detail="Upload token required")
+    if seller.get("status") == "approved":
+        raise HTTPException(status_code=403, detail="Documents of approved sellers can only be changed by an admin")
+
+
+def safe_filename(filename: str, fallback: str) -> str:
+    """Client-supplied filename reduced to something safe to put in a header"""
+    name = re.split(r"[\\/]", filename or "")[-1]
+    name = re.sub(r'[\x00-\x1f\x7f"]', "", name).strip()[:MAX_FILENAME_LENGTH]
+    return name or fallback
+
+
+def content_disposition(filename: str) -> str:
+    """inline Content-Disposition with an ASCII fallback and the UTF-8 name (RFC 6266)"""
+    ascii_name = filename.encode("ascii", "replace").decode().replace("?", "_")
+    return f"inline; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(filename)}"
+
+
+def public_documents(seller_id: str, documents: dict) -> dict:
+    """
+    Describe a seller's documents for API responses. Uploaded ones are
+    replaced by their metadata and download URL; legacy placeholder
+    filenames pass through unchanged.
+    """
+    result = {}
+    for kind, document in (documents or {}).items():
+        if isinstance(document, dict) and document.get("file_id"):
+            result[kind] = {
+                "filename": document["filename"],
+                "content_type": document["content_type"],
+                "size": document["size"],
+                "sha256": document["sha256"],
+                "uploaded_at": document["uploaded_at"].isoformat(),
+                "url": f"/seller/{seller_id}/documents/{kind}"
+            }
+        else:
+            result[kind] = document
+    return result
+
+
+def get_seller_or_404(seller_id: str, kind: str) -> dict:
+    if kind not in DOCUMENT_KINDS:
+        raise HTTPException(status_code=400, detail=f"Invalid document type. Must be one of: {', '.join(DOCUMENT_KINDS)}")
+    if not ObjectId.is_valid(seller_id):
+        raise HTTPException(status_code=400, detail="Invalid seller ID format")
+    seller = seller_collection.find_one({"_id": ObjectId(seller_id)}, {"documents": 1, "status": 1, "upload_token_hash": 1})
+    if not seller:
+        raise HTTPException(status_code=404, detail="Seller not found")
+    return seller
+
+
+@router.put("/seller/{seller_id}/documents/{kind}")
+async def upload_seller_document(seller_id: str, kind: str, request: Request):
+    """
+    Upload a KYC document as the raw request body (Content-Type must be the
+    file type). The body is streamed into GridFS and hashed as it arrives.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type not in ALLOWED_CONTENT_TYPES:
+        raise HTTPException(status_code=415, detail=f"Unsupported file type. Must be one of: {', '.join(ALLOWED_CONTENT_TYPES)}")
+
+    # Reject oversized uploads before reading any of the body
+    declared_size = request.headers.get("content-length", "")
+    if declared_size.isdigit() and int(declared_size) > MAX_DOCUMENT_BYTES:
+        raise HTTPException(status_code=413, detail=f"Document exceeds {MAX_DOCUMENT_BYTES // (1024 * 1024)} MB limit")
+
+    seller = await run_in_threadpool(get_seller_or_404, seller_id, kind)
+    check_upload_access(request, seller)
+
+    filename = safe_filename(request.headers.get("x-filename"), f"{kind}.{content_type.split('/')[1]}")
+    grid_in = document_bucket.open_upload_stream(
+        filename,
+        chunk_size_bytes=GRIDFS_CHUNK_BYTES,
+        metadata={"seller_id": seller_id, "kind": kind, "content_type": content_type}
+    )
+    sha256 = hashlib.sha256()
+    size = 0
+    buffer = bytearray()
+
+    try:
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > MAX_DOCUMENT_BYTES:
+                raise HTTPException(status_code=413, detail=f"Document exceeds {MAX_DOCUMENT_BYTES // (1024 * 1024)} MB limit")
+            sha256.update(chunk)
+            buffer += chunk
+            if len(buffer) >= WRITE_BUFFER_BYTES:
+                await run_in_threadpool(grid_in.write, bytes(buffer))
+                buffer.clear()
+
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Empty document")
+        if buffer:
+            await run_in_threadpool(grid_in.write, bytes(buffer))
+        await run_in_threadpool(grid_in.close)
+
+    except BaseException as e:
+        # Drop the chunks written so far (also on client disconnects)
+        await run_in_threadpool(grid_in.abort)
+        if isinstance(e, HTTPException):
+            raise
+        if isinstance(e, Exception):
+            raise HTTPException(status_code=500, detail=f"Error storing document: {str(e)}")
+        raise
+
+    document = {
+        "file_id": grid_in._id,
+        "filename": filename,
+        "content_type": content_type,
+        "size": size,
+        "sha256": sha256.hexdigest(),
+        "uploaded_at": datetime.utcnow()
+    }
+
+    try:
+        await run_in_threadpool(
+            seller_collection.update_one,
+            {"_id": ObjectId(seller_id)},
+            {"$set": {f"documents.{kind}": document}}
+        )
+    except Exception as e:
+        await run_in_threadpool(document_bucket.delete, grid_in._id)
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+    # Replace the previous upload of the same kind
+    previous = seller.get("documents", {}).get(kind)
+    if isinstance(previous, dict) and previous.get("file_id"):
+        try:
+            await run_in_threadpool(document_bucket.delete, previous["file_id"])
+        except NoFile:
+            pass
+
+    http_cache.bump("seller")
+    event_log.record("seller", seller_id, "document_uploaded", kind=kind, sha256=document["sha256"])
+
+    return {
+        "success": True,
+        "message": f"{kind} document uploaded successfully",
+        "data": {
+            "kind": kind,
+            "filename": filename,
+            "size": size,
+            "sha256": document["sha256"]
+        }
+    }
+
+
+def parse_range(header: str, size: int):
+    """Parse a single 'bytes=start-end' range; returns (start, end) inclusive or None"""
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    start, end = match.groups()
+    if start == "":
+        # Suffix range: the last N bytes
+        length = int(end)
+        if length == 0:
+            return None
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start > end:
+        return None
+    return start, end
+
+
+def stream_file(grid_out, start: int, length: int):
+    """Yield a byte range of a GridFS file in bounded chunks"""
+    try:
+        grid_out.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = grid_out.read(min(READ_CHUNK_BYTES, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        grid_out.close()
+
+
+@router.get("/seller/{seller_id}/documents/{kind}")
+def download_seller_document(seller_id: str, kind: str, request: Request):
+    """Serve an uploaded KYC document to the admin panel, honouring Range requests"""
+    check_admin_token(request)
+    seller = get_seller_or_404(seller_id, kind)
+    document = seller.get("documents", {}).get(kind)
+    if not isinstance(document, dict) or not document.get("file_id"):
+        raise HTTPException(status_code=404, detail="Document not uploaded")
+
+    try:
+        grid_out = document_bucket.open_download_stream(document["file_id"])
+    except NoFile:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    size = grid_out.length
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": f'"{document["sha256"]}"',
+        "Content-Disposition": content_disposition(safe_filename(document["filename"], kind))
+    }
+
+    range_header = request.headers.get("range")
+    if range_header:
+        byte_range = parse_range(range_header, size)
+        if byte_range is None:
+            grid_out.close()
+            raise HTTPException(status_code=416, detail="Invalid range", headers={"Content-Range": f"bytes */{size}"})
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(
+            stream_file(grid_out, start, end - start + 1),
+            status_code=206,
+            media_type=document["content_type"],
+            headers=headers
+        )
+
+    headers["Content-Length"] = str(size)
+    return StreamingResponse(stream_file(grid_out, 0, size), media_type=document["content_type"], headers=headers)
@@ -0,0 +1,188 @@
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import FileResponse, RedirectResponse
+from fastapi.concurrency import run_in_threadpool
+from bson.objectid import ObjectId
+from typing import Optional
+from database import inventory_collection, seller_collection
+from routes.documents import is_admin, hash_upload_token
+from thumbnails import thumbnail_cache, SIZES, FORMATS, MAX_SOURCE_BYTES
+import hashlib
+import hmac
+import os
+import re
+import uuid
+
+router = APIRouter()
+
+ALLOWED_IMAGE_TYPES = ["image/jpeg", "image/png", "image/webp"]
+WRITE_BUFFER_BYTES = 1024 * 1024
+# Thumbnail URLs contain the content hash, so they never change
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def pick_format(request: Request, fmt: Optional[str]) -> str:
+    if fmt:
+        if fmt not in FORMATS:
+            raise HTTPException(status_code=400, detail=f"Invalid format. Must be one of: {', '.join(FORMATS)}")
+        return fmt
+    return "webp" if "image/webp" in request.headers.get("accept", "") else "jpeg"
+
+
+def check_size(size: str):
+    if size not in SIZES:
+        raise HTTPException(status_code=400, detail=f"Invalid size. Must be one of: {', '.join(SIZES)}")
+
+
+def get_item_or_404(item_id: str) -> dict:
+    if not ObjectId.is_valid(item_id):
+        raise HTTPException(status_code=400, detail="Invalid item ID")
+    item = inventory_collection.find_one(
+        {"_id": ObjectId(item_id)},
+        {"image_url": 1, "image_hash": 1, "image_source_url": 1, "supplier": 1, "region": 1}
+    )
+    if not item:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return item
+
+
+def check_image_access(request: Request, item: dict):
+    """The admin panel, or the item's supplier with its X-Upload-Token"""
+    if is_admin(request):
+        return
+    token = request.headers.get("x-upload-token", "")
+    seller = seller_collection.find_one(
+        {"name": item.get("supplier"), "region": item.get("region")},
+        {"upload_token_hash": 1}
+    ) if token else None
+    stored = (seller or {}).get("upload_token_hash", "")
+    if not stored or not hmac.compare_digest(hash_upload_token(token), stored):
+        raise HTTPException(status_code=403, detail="Only the item's supplier or an admin can change its image")
+
+
+@router.put("/inventory/item/{item_id}/image")
+async def upload_item_image(item_id: str, request: Request):
+    """Upload an item image as the raw request body and pre-render its thumbnails"""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type not in ALLOWED_IMAGE_TYPES:
+        raise HTTPException(status_code=415, detail=f"Unsupported image type. Must be one of: {', '.join(ALLOWED_IMAGE_TYPES)}")
+
+    declared_size = request.headers.get("content-length", "")
+    if declared_size.isdigit() and int(declared_size) > MAX_SOURCE_BYTES:
+        raise HTTPException(status_code=413, detail="Image is too large")
+
+    item = await run_in_threadpool(get_item_or_404, item_id)
+    await run_in_threadpool(check_image_access, request, item)
+
+    # Stream to a temporary file, hashing as we go, then move it into place
+    tmp_path = os.path.join(thumbnail_cache.source_dir, f"upload.{uuid.uuid4().hex}.tmp")
+    sha256 = hashlib.sha256()
+    size = 0
+    buffer = bytearray()
+    out = await run_in_threadpool(open, tmp_path, "wb")
+    try:
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > MAX_SOURCE_BYTES:
+                raise HTTPException(status_code=413, detail="Image is too large")
+            sha256.update(chunk)
+            buffer += chunk
+            if len(buffer) >= WRITE_BUFFER_BYTES:
+                await run_in_threadpool(out.write, bytes(buffer))
+                buffer.clear()
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Empty image")
+        await run_in_threadpool(out.write, bytes(buffer))
+        await run_in_threadpool(out.close)
+        key = sha256.hexdigest()
+        await run_in_threadpool(thumbnail_cache.store_source, tmp_path, key)
+    finally:
+        out.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    try:
+        await thumbnail_cache.render(key)
+    except Exception as e:
+        # Not an image we can decode; don't keep it around
+        await run_in_threadpool(thumbnail_cache.remove_source, key)
+        raise HTTPException(status_code=400, detail=f"Could not process image: {str(e)}")
+
+    await run_in_threadpool(
+        inventory_collection.update_one,
+        {"_id": ObjectId(item_id)},
+        {"$set": {"image_hash": key}, "$unset": {"image_source_url": ""}}
+    )
+
+    return {
+        "message": "Image uploaded successfully",
+        "image_hash": key,
+        "thumbnails": {
+            size_name: {fmt: f"/images/{key}/{size_name}.{fmt}" for fmt in FORMATS}
+            for size_name in SIZES
+        }
+    }
+
+
+@router.get("/inventory/item/{item_id}/thumbnail")
+async def get_item_thumbnail(
+    item_id: str,
+    request: Request,
+    size: str = Query("md", description="Thumbnail size: sm, md or lg"),
+    format: Optional[str] = Query(None, description="webp or jpeg; negotiated from Accept if omitted")
+):
+    """Redirect to the content-addressed thumbnail of an item's image"""
+    check_size(size)
+    fmt = pick_format(request, format)
+    item = await run_in_threadpool(get_item_or_404, item_id)
+
+    key = item.get("image_hash")
+    image_url = item.get("image_url") or ""
+    # Items pointing at a remote image are fetched once on first request
+    if image_url.startswith(("http://", "https://")) and item.get("image_source_url") != image_url:
+        key = None
+    # The source may have been evicted while its thumbnails are still cached
+    if not key or not (thumbnail_cache.has_source(key) or thumbnail_cache.lookup(key, size, fmt)):
+        if not image_url.startswith(("http://", "https://")):
+            raise HTTPException(status_code=404, detail="Item has no image")
+        try:
+            key = await run_in_threadpool(thumbnail_cache.fetch_source, image_url)
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=f"Could not fetch item image: {str(e)}")
+        await run_in_threadpool(
+            inventory_collection.update_one,
+            {"_id": ObjectId(item_id)},
+            {"$set": {"image_hash": key, "image_source_url": image_url}}
+        )
+
+    return RedirectResponse(
+        f"/images/{key}/{size}.{fmt}",
+        status_code=307,
+        headers={"Cache-Control": "public, max-age=300", "Vary": "Accept"}
+    )
+
+
+@router.get("/images/{key}/{variant}")
+async def get_thumbnail(key: str, variant: str):
+    """Serve a rendered thumbnail, rendering it on first request"""
+    match = re.fullmatch(r"(\w+)\.(\w+)", variant)
+    if not re.fullmatch(r"[0-9a-f]{64}", key) or not match:
+        raise HTTPException(status_code=404, detail="Image not found")
+    size, fmt = match.groups()
+    check_size(size)
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    path = thumbnail_cache.lookup(key, size, fmt)
+    if path is None:
+        if not thumbnail_cache.has_source(key):
+            raise HTTPException(status_code=404, detail="Image not found")
+        try:
+            path = await thumbnail_cache.get(key, size, fmt)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error rendering thumbnail: {str(e)}")
+
+    return FileResponse(
+        path,
+        media_type=FORMATS[fmt],
+        headers={"Cache-Control": IMMUTABLE_CACHE_CONTROL, "ETag": f'"{key}-{size}-{fmt}"'}
+    )
@@ -1,110 +1,352 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from typing import List, Optional
-from models.inventory import InventoryItem, OrderCreate, OrderResponse
-from database import inventory_collection, order_collection, vendor_collection
+from models.inventory import InventoryItem, OrderCreate, OrderResponse, CartQuote
+from database import inventory_collection, order_collection, vendor_collection, event_collection, tombstone_collection
+from database import collection, route_workload, with_shard_key, OLTP, ANALYTICS
 from bson.objectid import ObjectId
+from pymongo import ReturnDocument
 from datetime import datetime
 import uuid
+import http_cache
+import change_feed
+import resilience
+from catalog_snapshot import snapshot_for, SNAPSHOT_MAX_AGE
+from pricing import price_index, price_line, LineError, PRICE_FIELDS
+from facets import facet_index, FACET_FIELDS
+from price_compare import price_comparison, canonical_name, COMPARE_FIELDS
+from geo import to_point, estimate_delivery
+from routes.suppliers import nearest_sellers
+from event_log import event_log
+from regions import current_region, requested_region, scoped
+from order_commit import commit_order, order_batcher, GROUP_COMMIT_ENABLED
 
 router = APIRouter()
 
+def to_inventory_item(item: dict) -> InventoryItem:
+    """Convert a MongoDB inventory document to InventoryItem format"""
+    return InventoryItem(
+        id=str(item["_id"]),
+        name=item["name"],
+        category=item["category"],
+        price=item["price"],
+        stock=item["stock"],
+        unit=item["unit"],
+        supplier=item["supplier"],
+        rating=item.get("rating", 0),
+        description=item.get("description", ""),
+        image_url=item.get("image_url", ""),
+        min_order_quantity=item.get("min_order_quantity", 1),
+        delivery_time=item.get("delivery_time", "2-3 days"),
+        last_updated=item.get("last_updated", datetime.now())
+    )
+
+def build_item_query(category, min_stock, max_price, search) -> dict:
+    """Build the MongoDB filter shared by the catalog listing endpoints"""
+    # Only in-stock items of the request's region
+    query = {"region": current_region(), "stock": {"$gt": 0}}
+    
+    # Exact match so the (region, category, stock) index is used; clients pick
+    # category names from /inventory/categories or the facet counts.
+    if category:
+        query["category"] = category
+    
+    if min_stock:
+        query["stock"]["$gte"] = min_stock
+        
+    if max_price:
+        query["price"] = {"$lte": max_price}
+        
+    if search:
+        query["$or"] = [
+            {"name": {"$regex": search, "$options": "i"}},
+            {"description": {"$regex": search, "$options": "i"}},
+            {"supplier": {"$regex": search, "$options": "i"}}
+        ]
+    
+    return query
+
+def get_facet_index():
+    """Return the request region's facet index, loading them on first use if startup did not"""
+    if not facet_index.loaded:
+        facet_index.load(inventory_collection.find({}, FACET_FIELDS))
+    return facet_index.for_region(current_region())
+
+def get_price_index():
+    """Return the price index, loading it on first use if startup did not"""
+    if not price_index.loaded:
+        price_index.load(inventory_collection.find({}, PRICE_FIELDS))
+    return price_index
+
+def get_price_comparison():
+    """Return the request region's price comparison index, loading them on first use if startup did not"""
+    if not price_comparison.loaded:
+        price_comparison.load(inventory_collection.find({}, COMPARE_FIELDS))
+    return price_comparison.for_region(current_region())
+
 @router.get("/inventory/items", response_model=List[InventoryItem])
 def get_available_items(
+    request: Request,
+    response: Response,
     category: Optional[str] = Query(None, description="Filter by category"),
     min_stock: Optional[int] = Query(None, description="Minimum stock level"),
     max_price: Optional[float] = Query(None, description="Maximum price"),
     search: Optional[str] = Query(None, description="Search by name")
 ):
     """Get all available inventory items with optional filters"""
+    resource = http_cache.regional("inventory", current_region())
+    etag = http_cache.etag_for(resource, "items", category, min_stock, max_price, search)
+    cached = http_cache.not_modified(request, resource, etag)
+    if cached:
+        return cached
+    
     try:
-        # Build query
-        query = {"stock": {"$gt": 0}}  # Only items with stock > 0
+        query = build_item_query(category, min_stock, max_price, search)
         
-        if category:
-            query["category"] = {"$regex": category, "$options": "i"}
-        
-        if min_stock:
-            query["stock"]["$gte"] = min_stock
-            
-        if max_price:
-            query["price"] = {"$lte": max_price}
-            
-        if search:
-            query["$or"] = [
-                {"name": {"$regex": search, "$options": "i"}},
-                {"description": {"$regex": search, "$options": "i"}},
-                {"supplier": {"$regex": search, "$options": "i"}}
-            ]
-        
-        # Get items from database
-        items = list(inventory_collection.find(query))
+        # Get items from database (last good result while it is unreachable)
+        items = resilience.read(
+            lambda: list(inventory_collection.find(query)),
+            cache_key=("inventory.items", query["region"], category, min_stock, max_price, search)
+        )
         
         # Convert MongoDB documents to InventoryItem format
-        result = []
-        for item in items:
-            inventory_item = InventoryItem(
-                id=str(item["_id"]),
-                name=item["name"],
-                category=item["category"],
-                price=item["price"],
-                stock=item["stock"],
-                unit=item["unit"],
-                supplier=item["supplier"],
-                rating=item.get("rating", 0),
-                description=item.get("description", ""),
-                image_url=item.get("image_url", ""),
-                min_order_quantity=item.get("min_order_quantity", 1),
-                delivery_time=item.get("delivery_time", "2-3 days"),
-                last_updated=item.get("last_updated", datetime.now())
-            )
-            result.append(inventory_item)
+        result = [to_inventory_item(item) for item in items]
         
+        http_cache.set_cache_headers(response, resource, etag)
         return result
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching inventory: {str(e)}")
 
+@router.get("/inventory/compare")
+def compare_prices(
+    name: str = Query(..., min_length=1, description="Ingredient name, e.g. 'rice' or 'Basmati Rice'"),
+    limit: int = Query(10, ge=1, le=100, description="Maximum offers per unit"),
+    include_out_of_stock: bool = Query(False, description="Also list offers with no stock")
+):
+    """
+    Compare supplier offers for an ingredient by price per base unit
+    (kg, liter, packet, piece), cheapest first. Names are matched on the
+    canonical ingredient, so 'Basmati Rice' and 'Rice' are compared together
+    while 'Turmeric Powder' and 'Red Chilli Powder' are not; 'turmeric'
+    alone finds turmeric powder.
+    """
+    try:
+        groups = get_price_comparison().compare(name, limit=limit, in_stock_only=not include_out_of_stock)
+        if not groups:
+            raise HTTPException(status_code=404, detail=f"No offers found for '{name}'")
+        return {"ingredient": canonical_name(name)[0], "groups": groups}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error comparing prices: {str(e)}")
+
 @router.get("/inventory/categories")
-def get_categories():
+def get_categories(request: Request, response: Response):
     """Get all available categories"""
+    resource = http_cache.regional("inventory", current_region())
+    etag = http_cache.etag_for(resource, "categories")
+    cached = http_cache.not_modified(request, resource, etag)
+    if cached:
+        return cached
+    
     try:
-        categories = inventory_collection.distinct("category")
+        categories = get_facet_index().all_categories()
+        http_cache.set_cache_headers(response, resource, etag)
         return {"categories": categories}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching categories: {str(e)}")
 
+@router.get("/inventory/browse")
+def browse_items(
+    request: Request,
+    response: Response,
+    category: Optional[str] = Query(None, description="Filter by category"),
+    min_stock: Optional[int] = Query(None, description="Minimum stock level"),
+    max_price: Optional[float] = Query(None, description="Maximum price"),
+    search: Optional[str] = Query(None, description="Search by name")
+):
+    """Get filtered inventory items together with the region's facet counts"""
+    resource = http_cache.regional("inventory", current_region())
+    etag = http_cache.etag_for(resource, "browse", category, min_stock, max_price, search)
+    cached = http_cache.not_modified(request, resource, etag)
+    if cached:
+        return cached
+    
+    try:
+        query = build_item_query(category, min_stock, max_price, search)
+        docs = resilience.read(
+            lambda: list(inventory_collection.find(query)),
+            cache_key=("inventory.browse", query["region"], category, min_stock, max_price, search)
+        )
+        items = [to_inventory_item(item) for item in docs]
+        
+        http_cache.set_cache_headers(response, resource, etag)
+        return {
+            "items": items,
+            "count": len(items),
+            "facets": get_facet_index().snapshot()
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error browsing inventory: {str(e)}")
+
 @router.get("/inventory/item/{item_id}", response_model=InventoryItem)
-def get_item_details(item_id: str):
+def get_item_details(item_id: str, request: Request, response: Response):
     """Get detailed information about a specific item"""
+    etag = http_cache.etag_for("inventory", "item", item_id)
+    cached = http_cache.not_modified(request, "inventory", etag)
+    if cached:
+        return cached
+    
     try:
         if not ObjectId.is_valid(item_id):
             raise HTTPException(status_code=400, detail="Invalid item ID")
             
-        item = inventory_collection.find_one({"_id": ObjectId(item_id)})
+        item = resilience.read(
+            lambda: inventory_collection.find_one({"_id": ObjectId(item_id)}),
+            cache_key=("inventory.item", item_id)
+        )
         if not item:
             raise HTTPException(status_code=404, detail="Item not found")
         
-        return InventoryItem(
-            id=str(item["_id"]),
-            name=item["name"],
-            category=item["category"],
-            price=item["price"],
-            stock=item["stock"],
-            unit=item["unit"],
-            supplier=item["supplier"],
-            rating=item.get("rating", 0),
-            description=item.get("description", ""),
-            image_url=item.get("image_url", ""),
-            min_order_quantity=item.get("min_order_quantity", 1),
-            delivery_time=item.get("delivery_time", "2-3 days"),
-            last_updated=item.get("last_updated", datetime.now())
-        )
+        http_cache.set_cache_headers(response, "inventory", etag)
+        return to_inventory_item(item)
         
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching item details: {str(e)}")
 
+@router.get("/inventory/snapshot")
+def get_catalog_snapshot(request: Request):
+    """
+    Get the region's whole catalog as a columnar MessagePack snapshot.
+    Clients then call /inventory/changes with the embedded cursor.
+    """
+    try:
+        payload, etag = snapshot_for(current_region()).current()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error building catalog snapshot: {str(e)}")
+    
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={SNAPSHOT_MAX_AGE}"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(content=payload, media_type="application/x-msgpack", headers=headers)
+
+@router.delete("/inventory/item/{item_id}")
+def delete_item(item_id: str):
+    """Remove an item from the catalog, leaving a tombstone for synced clients"""
+    try:
+        if not ObjectId.is_valid(item_id):
+            raise HTTPException(status_code=400, detail="Invalid item ID")
+        
+        deleted = inventory_collection.find_one_and_delete(
+            with_shard_key(inventory_collection, {"_id": ObjectId(item_id)}), {"region": 1}
+        )
+        if deleted is None:
+            raise HTTPException(status_code=404, detail="Item not found")
+        
+        region = deleted.get("region", current_region())
+        change_feed.record_deletion(item_id, region)
+        facet_index.remove(item_id)
+        price_index.remove(item_id)
+        price_comparison.remove(item_id)
+        http_cache.bump("inventory", region)
+        
+        return {"message": "Item deleted successfully"}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error deleting item: {str(e)}")
+
+@router.get("/inventory/changes")
+def get_inventory_changes(
+    since: int = Query(0, ge=0, description="Cursor returned by the previous sync, 0 for a full sync"),
+    limit: int = Query(500, ge=1, le=5000, description="Maximum number of changes to return")
+):
+    """Get the region's inventory items changed or deleted after a sync cursor, oldest first"""
+    try:
+        upper = change_feed.safe_cursor()
+        if upper <= since:
+            return {"changes": [], "deleted": [], "cursor": since, "has_more": False}
+        
+        seq_range = scoped({"change_seq": {"$gt": since, "$lte": upper}})
+        items = list(inventory_collection.find(seq_range).sort("change_seq", 1).limit(limit))
+        tombstones = list(tombstone_collection.find(seq_range).sort("change_seq", 1).limit(limit))
+        
+        # Merge both streams in sequence order and cut at the limit
+        merged = sorted(items + tombstones, key=lambda doc: doc["change_seq"])[:limit]
+        has_more = len(items) == limit or len(tombstones) == limit or len(merged) < len(items) + len(tombstones)
+        
+        changes = []
+        deleted = []
+        for doc in merged:
+            if "item_id" in doc:
+                deleted.append(doc["item_id"])
+            else:
+                changes.append({
+                    "type": "upsert" if doc["stock"] > 0 else "out_of_stock",
+                    "item": to_inventory_item(doc)
+                })
+        
+        return {
+            "changes": changes,
+            "deleted": deleted,
+            "cursor": merged[-1]["change_seq"] if has_more else upper,
+            "has_more": has_more
+        }
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching inventory changes: {str(e)}")
+
+@router.post("/orders/quote")
+def quote_order(cart: CartQuote):
+    """
+    Price a cart and check stock, minimum quantities and region without
+    placing it. Served from the in-memory price index; place_order
+    re-checks against the database. The region is the vendor's when
+    vendor_id is given, else the request's.
+    """
+    try:
+        region = current_region()
+        if cart.vendor_id:
+            if not ObjectId.is_valid(cart.vendor_id):
+                raise HTTPException(status_code=400, detail="Invalid vendor ID")
+            vendor = resilience.read(lambda: vendor_collection.find_one({"_id": ObjectId(cart.vendor_id)}, {"region": 1}))
+            if not vendor:
+                raise HTTPException(status_code=404, detail="Vendor not found")
+            region = vendor.get("region", region)
+        
+        index = get_price_index()
+        lines = []
+        total_amount = 0
+        
+        for item in cart.items:
+            try:
+                line = price_line(item, index.get(item.item_id), region)
+                line["available"] = True
+                total_amount += line["total"]
+            except LineError as e:
+                line = {"item_id": item.item_id, "quantity": item.quantity, "available": False, "error": e.detail}
+            lines.append(line)
+        
+        return {
+            "items": lines,
+            "total_amount": total_amount,
+            "valid": all(line["available"] for line in lines)
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error quoting order: {str(e)}")
+
 @router.post("/orders/place", response_model=OrderResponse)
 def place_order(order_data: OrderCreate):
     """Place a new order"""
@@ -112,47 +354,52 @@ def place_order(order_data: OrderCreate):
         # Verify vendor exists
         if not ObjectId.is_valid(order_data.vendor_id):
             raise HTTPException(status_code=400, detail="Invalid vendor ID")
+        
+        # Refuse quickly rather than queue writes against a database that is down
+        resilience.ensure_available(OLTP)
             
-        vendor = vendor_collection.find_one({"_id": ObjectId(order_data.vendor_id)})
+        vendor = resilience.read(lambda: vendor_collection.find_one({"_id": ObjectId(order_data.vendor_id)}))
         if not vendor:
             raise HTTPException(status_code=404, detail="Vendor not found")
         
+        # An order lives in its vendor's region and may only contain that
+        # region's items, so it touches a single partition
+        region = vendor.get("region", current_region())
+        
         # Verify all items exist and have sufficient stock
         total_amount = 0
         order_items = []
         
         for item in order_data.items:
-            if not ObjectId.is_valid(item.item_id):
-                raise HTTPException(status_code=400, detail=f"Invalid item ID: {item.item_id}")
-                
-            inventory_item = inventory_collection.find_one({"_id": ObjectId(item.item_id)})
-            if not inventory_item:
-                raise HTTPException(status_code=404, detail=f"Item not found: {item.item_id}")
-            
-            if inventory_item["stock"] < item.quantity:
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"Insufficient stock for {inventory_item['name']}. Available: {inventory_item['stock']}, Requested: {item.quantity}"
-                )
+            inventory_item = None
+            if ObjectId.is_valid(item.item_id):
+                # Items of other regions read as not found
+                inventory_item = inventory_collection.find_one(scoped({"_id": ObjectId(item.item_id)}, region))
+            try:
+                line = price_line(item, inventory_item, region)
+            except LineError as e:
+                raise HTTPException(status_code=e.status_code, detail=e.detail)
             
-            if item.quantity < inventory_item.get("min_order_quantity", 1):
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Minimum order quantity for {inventory_item['name']} is {inventory_item.get('min_order_quantity', 1)}"
-                )
-            
-            item_total = inventory_item["price"] * item.quantity
-            total_amount += item_total
-            
-            order_items.append({
-                "item_id": item.item_id,
-                "name": inventory_item["name"],
-                "price": inventory_item["price"],
-                "quantity": item.quantity,
-                "unit": inventory_item["unit"],
-                "total": item_total,
-                "supplier": inventory_item["supplier"]
-            })
+            total_amount += line["total"]
+            order_items.append(line)
+        
+        # Estimate delivery from the nearest approved seller supplying this order
+        try:
+            delivery_location = to_point(order_data.delivery_latitude, order_data.delivery_longitude)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        estimated_delivery = order_data.estimated_delivery
+        if delivery_location and not estimated_delivery:
+            suppliers = list({line["supplier"] for line in order_items})
+            nearest = nearest_sellers(
+                order_data.delivery_latitude,
+                order_data.delivery_longitude,
+                scoped({"status": "approved", "name": {"$in": suppliers}}, region),
+                limit=1
+            )
+            distance_km = nearest[0]["distance_m"] / 1000 if nearest else None
+            estimated_delivery = estimate_delivery(distance_km)
         
         # Generate order ID
         order_id = str(uuid.uuid4())[:8].upper()
@@ -163,31 +410,33 @@ def place_order(order_data: OrderCreate):
             "vendor_id": order_data.vendor_id,
             "vendor_name": vendor["full_name"],
             "vendor_phone": vendor["phone"],
+            "region": region,
             "items": order_items,
             "total_amount": total_amount,
             "status": "pending",
             "delivery_address": order_data.delivery_address,
             "notes": order_data.notes,
             "created_at": datetime.now(),
-            "estimated_delivery": order_data.estimated_delivery or "2-3 days"
+            "estimated_delivery": estimated_delivery or "2-3 days"
         }
+        if delivery_location:
+            order_doc["delivery_location"] = delivery_location
         
-        # Insert order
-        result = order_collection.insert_one(order_doc)
-        
-        # Update inventory stocks
-        for item in order_data.items:
-            inventory_collection.update_one(
-                {"_id": ObjectId(item.item_id)},
-                {"$inc": {"stock": -item.quantity}}
-            )
+        # Insert the order and decrement stock, either on its own or
+        # coalesced with concurrent orders when group commit is enabled
+        if GROUP_COMMIT_ENABLED:
+            stock_update = order_batcher.submit(order_doc).result()
+        else:
+            stock_update = commit_order(order_doc)
+        event_log.record("order", order_id, "created", status="pending", total_amount=total_amount)
         
         return OrderResponse(
             order_id=order_id,
             vendor_id=order_data.vendor_id,
             total_amount=total_amount,
             status="pending",
-            message="Order placed successfully",
+            # The order is stored either way; a retry would place it twice
+            message="Order placed successfully" if stock_update is None else "Order placed; stock update pending",
             estimated_delivery=order_doc["estimated_delivery"]
         )
         
@@ -196,18 +445,27 @@ def place_order(order_data: OrderCreate):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error placing order: {str(e)}")
 
-@router.get("/orders/vendor/{vendor_id}")
+# Vendor order history is a heavy read that tolerates slight staleness
+@router.get("/orders/vendor/{vendor_id}", dependencies=[Depends(route_workload(ANALYTICS))])
 def get_vendor_orders(vendor_id: str, status: Optional[str] = Query(None)):
     """Get all orders for a specific vendor"""
     try:
         if not ObjectId.is_valid(vendor_id):
             raise HTTPException(status_code=400, detail="Invalid vendor ID")
         
-        query = {"vendor_id": vendor_id}
+        # Orders live in their vendor's region
+        region = requested_region()
+        if region is None:
+            vendor = collection("vendor").find_one({"_id": ObjectId(vendor_id)}, {"region": 1})
+            if not vendor:
+                raise HTTPException(status_code=404, detail="Vendor not found")
+            region = vendor.get("region", current_region())
+        
+        query = scoped({"vendor_id": vendor_id}, region)
         if status:
             query["status"] = status
         
-        orders = list(order_collection.find(query).sort("created_at", -1))
+        orders = list(collection("orders").find(query).sort("created_at", -1))
         
         # Convert ObjectId to string
         for order in orders:
@@ -221,11 +479,16 @@ def get_vendor_orders(vendor_id: str, status: Optional[str] = Query(None)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching orders: {str(e)}")
 
+def order_lookup(order_id: str) -> dict:
+    """Filter for one order, confined to the request's region when it names one"""
+    region = requested_region()
+    return scoped({"order_id": order_id}, region) if region else {"order_id": order_id}
+
 @router.get("/orders/{order_id}")
 def get_order_details(order_id: str):
     """Get detailed information about a specific order"""
     try:
-        order = order_collection.find_one({"order_id": order_id})
+        order = order_collection.find_one(order_lookup(order_id))
         if not order:
             raise HTTPException(status_code=404, detail="Order not found")
         
@@ -239,6 +502,35 @@ def get_order_details(order_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching order details: {str(e)}")
 
+@router.get("/orders/{order_id}/timeline")
+def get_order_timeline(order_id: str):
+    """Get the lifecycle events of an order, oldest first"""
+    try:
+        # Read the unflushed transitions first so an event flushed in between
+        # shows up in the database read; duplicates are dropped below.
+        pending = event_log.pending_for("order", order_id)
+        events = list(event_collection.find({"entity": "order", "entity_id": order_id}).sort("at", 1))
+        seen = {event["_id"] for event in events}
+        events.extend(event for event in pending if event["_id"] not in seen)
+        
+        if not events and not order_collection.find_one(order_lookup(order_id), {"_id": 1}):
+            raise HTTPException(status_code=404, detail="Order not found")
+        
+        timeline = [
+            {
+                "event": event["event"],
+                "at": event["at"].isoformat(),
+                **event.get("data", {})
+            }
+            for event in events
+        ]
+        return {"order_id": order_id, "timeline": timeline, "count": len(timeline)}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching order timeline: {str(e)}")
+
 @router.put("/orders/{order_id}/status")
 def update_order_status(order_id: str, status: str):
     """Update order status"""
@@ -247,14 +539,19 @@ def update_order_status(order_id: str, status: str):
         if status not in valid_statuses:
             raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {valid_statuses}")
         
-        result = order_collection.update_one(
-            {"order_id": order_id},
-            {"$set": {"status": status, "updated_at": datetime.now()}}
+        # Single write; the previous status comes back for the event log
+        previous = order_collection.find_one_and_update(
+            with_shard_key(order_collection, {"order_id": order_id}),
+            {"$set": {"status": status, "updated_at": datetime.now()}},
+            projection={"status": 1},
+            return_document=ReturnDocument.BEFORE
         )
         
-        if result.matched_count == 0:
+        if previous is None:
             raise HTTPException(status_code=404, detail="Order not found")
         
+        event_log.record("order", order_id, "status_changed", previous=previous.get("status"), status=status)
+        
         return {"message": f"Order status updated to {status}"}
         
     except HTTPException:
@@ -264,9 +561,9 @@ def update_order_status(order_id: str, status: str):
 
 @router.get("/inventory/low-stock")
 def get_low_stock_items(threshold: int = Query(20, description="Stock threshold")):
-    """Get items with stock below threshold"""
+    """Get the region's items with stock below threshold"""
     try:
-        items = list(inventory_collection.find({"stock": {"$lte": threshold}}))
+        items = list(inventory_collection.find(scoped({"stock": {"$lte": threshold}})))
         
         result = []
         for item in items:
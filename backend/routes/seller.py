@@ -1,19 +1,35 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from pydantic import BaseModel, EmailStr
-from database import client
+from typing import Optional
+from database import client, collection, current_workload, route_workload, ANALYTICS
 from bson.objectid import ObjectId
+from geo import to_point
+from price_compare import product_keys
+from event_log import event_log
+from routes.documents import public_documents, issue_upload_token, DOCUMENT_KINDS
+from datetime import datetime
+import http_cache
+import resilience
+from regions import current_region, requested_region, region_for_point, scoped
 
 router = APIRouter()
 
 db = client["Rasoisetu"]
 sellers_collection = db["seller"]
 
+def admin_filter(query: dict) -> dict:
+    """Admin views cover every region unless the request names one"""
+    region = requested_region()
+    return scoped(query, region) if region else query
+
 class Seller(BaseModel):
     name: str
     email: EmailStr
     phone: str
     password: str
     products: list[str]
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
 
 class SellerLogin(BaseModel):
     email: EmailStr
@@ -31,7 +47,15 @@ async def register_seller(seller: Seller):
     if existing:
         raise HTTPException(status_code=400, detail="Seller already exists")
 
+    try:
+        location = to_point(seller.latitude, seller.longitude)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     hashed_password = seller.password  # In real apps, hash it
+    # Lets the seller upload its own KYC documents until it is approved;
+    # only the hash is stored
+    upload_token, upload_token_hash = issue_upload_token()
 
     seller_data = {
         "name": seller.name,
@@ -39,17 +63,29 @@ async def register_seller(seller: Seller):
         "phone": seller.phone,
         "password": hashed_password,
         "products": seller.products,
-        "documents": {
-            "aadhar": "aadhar_uploaded.pdf",
-            "pan": "pan_uploaded.pdf",
-            "bank": "bank_uploaded.pdf"
-        },
+        "product_keys": sorted({key for product in seller.products for key in product_keys(product)}),
+        # Filled in by PUT /seller/{id}/documents/{kind}
+        "documents": {},
+        "upload_token_hash": upload_token_hash,
         "status": "pending",
-        "rating": 0
+        "rating": 0,
+        # Partition by where the seller operates, else the region the request came from
+        "region": region_for_point(seller.latitude, seller.longitude)
     }
+    if location:
+        seller_data["location"] = location
 
     result = sellers_collection.insert_one(seller_data)
-    return {"message": "Seller registered successfully", "seller_id": str(result.inserted_id)}
+    http_cache.bump("seller", seller_data["region"])
+    event_log.record("seller", str(result.inserted_id), "registered", status="pending")
+    seller_id = str(result.inserted_id)
+    return {
+        "message": "Seller registered successfully",
+        "seller_id": seller_id,
+        # Send as X-Upload-Token with each document upload
+        "upload_token": upload_token,
+        "document_upload_urls": {kind: f"/seller/{seller_id}/documents/{kind}" for kind in DOCUMENT_KINDS}
+    }
 
 @router.post("/seller/login")
 async def login_seller(login_data: SellerLogin):
@@ -63,6 +99,10 @@ async def login_seller(login_data: SellerLogin):
     if seller.get("status") != "approved":
         raise HTTPException(status_code=403, detail="Account not approved yet")
 
+    # A fresh upload token (replacing the previous one) for item image uploads
+    upload_token, upload_token_hash = issue_upload_token()
+    sellers_collection.update_one({"_id": seller["_id"]}, {"$set": {"upload_token_hash": upload_token_hash}})
+
     return {
         "message": "Login successful",
         "seller": {
@@ -70,7 +110,8 @@ async def login_seller(login_data: SellerLogin):
             "name": seller["name"],
             "email": seller["email"],
             "phone": seller["phone"]
-        }
+        },
+        "upload_token": upload_token
     }
 
 @router.post("/seller/check-status")
@@ -161,13 +202,20 @@ async def get_seller_status_by_email(email: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
-@router.get("/seller/all")
-async def get_all_sellers():
+# The full export reads from the analytics pool. The admin dashboard's
+# pending/approved/rejected lists and stats stay on the primary, so its
+# counts agree with the lists right after a status change.
+@router.get("/seller/all", dependencies=[Depends(route_workload(ANALYTICS))])
+def get_all_sellers():
     """
     Get all sellers with their status (for admin panel)
     """
     try:
-        sellers = list(sellers_collection.find({}))
+        sellers = resilience.read(
+            lambda: list(collection("seller").find(admin_filter({}))),
+            cache_key=("seller.all", requested_region()),
+            workload=current_workload()
+        )
         seller_list = []
         
         for seller in sellers:
@@ -179,7 +227,7 @@ async def get_all_sellers():
                 "products": seller.get("products", []),
                 "status": seller.get("status", "pending"),
                 "rating": seller.get("rating", 0),
-                "documents": seller.get("documents", {})
+                "documents": public_documents(str(seller["_id"]), seller.get("documents", {}))
             }
             seller_list.append(seller_data)
         
@@ -190,16 +238,27 @@ async def get_all_sellers():
             "count": len(seller_list)
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 @router.get("/seller/approved")
-async def get_approved_sellers():
+def get_approved_sellers(request: Request, response: Response):
     """
     Get all approved sellers
     """
+    resource = http_cache.regional("seller", current_region())
+    etag = http_cache.etag_for(resource, "approved")
+    cached = http_cache.not_modified(request, resource, etag)
+    if cached:
+        return cached
+    
     try:
-        sellers = list(sellers_collection.find({"status": "approved"}))
+        sellers = resilience.read(
+            lambda: list(sellers_collection.find(scoped({"status": "approved"}))),
+            cache_key=("seller.approved", current_region())
+        )
         seller_list = []
         
         for seller in sellers:
@@ -214,6 +273,7 @@ async def get_approved_sellers():
             }
             seller_list.append(seller_data)
         
+        http_cache.set_cache_headers(response, resource, etag)
         return {
             "success": True,
             "message": f"Retrieved {len(seller_list)} approved sellers",
@@ -221,16 +281,18 @@ async def get_approved_sellers():
             "count": len(seller_list)
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 @router.get("/seller/rejected")
-async def get_rejected_sellers():
+def get_rejected_sellers():
     """
     Get all rejected sellers
     """
     try:
-        sellers = list(sellers_collection.find({"status": "rejected"}))
+        sellers = list(sellers_collection.find(admin_filter({"status": "rejected"})))
         seller_list = []
         
         for seller in sellers:
@@ -256,12 +318,12 @@ async def get_rejected_sellers():
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 @router.get("/seller/pending")
-async def get_pending_sellers():
+def get_pending_sellers():
     """
     Get all pending seller applications
     """
     try:
-        sellers = sellers_collection.find({"status": "pending"})
+        sellers = sellers_collection.find(admin_filter({"status": "pending"}))
         result = []
         for seller in sellers:
             result.append({
@@ -279,16 +341,16 @@ async def get_pending_sellers():
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 @router.get("/seller/stats")
-async def get_seller_statistics():
+def get_seller_statistics():
     """
     Get seller statistics for admin dashboard
     """
     try:
         # Get counts by status
-        total_sellers = sellers_collection.count_documents({})
-        pending_count = sellers_collection.count_documents({"status": "pending"})
-        approved_count = sellers_collection.count_documents({"status": "approved"})
-        rejected_count = sellers_collection.count_documents({"status": "rejected"})
+        total_sellers = sellers_collection.count_documents(admin_filter({}))
+        pending_count = sellers_collection.count_documents(admin_filter({"status": "pending"}))
+        approved_count = sellers_collection.count_documents(admin_filter({"status": "approved"}))
+        rejected_count = sellers_collection.count_documents(admin_filter({"status": "rejected"}))
         
         # Calculate approval rate
         approval_rate = 0
@@ -346,13 +408,16 @@ async def update_seller_status(seller_id: str, request: StatusUpdateRequest):
             {
                 "$set": {
                     "status": request.status,
-                    "updated_at": "2024-01-01T00:00:00Z"  # You can use datetime.utcnow() for real timestamp
+                    "updated_at": datetime.utcnow()
                 }
             }
         )
         
         if result.modified_count == 0:
             raise HTTPException(status_code=500, detail="Failed to update seller status")
+        http_cache.bump("seller", existing_seller.get("region"))
+        event_log.record("seller", seller_id, "status_changed",
+                         previous=existing_seller.get("status"), status=request.status)
         
         # Get updated seller data
         updated_seller = sellers_collection.find_one({"_id": ObjectId(seller_id)})
@@ -394,7 +459,7 @@ async def get_seller_details(seller_id: str):
             "products": seller.get("products", []),
             "status": seller.get("status", "pending"),
             "rating": seller.get("rating", 0),
-            "documents": seller.get("documents", {})
+            "documents": public_documents(str(seller["_id"]), seller.get("documents", {}))
         }
         
         return {
@@ -0,0 +1,78 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import List, Optional
+from database import seller_collection
+from price_compare import product_key, product_keys
+from geo import to_point, estimate_delivery
+from regions import region_for_point, requested_region, scoped
+
+router = APIRouter()
+
+
+def nearest_sellers(latitude: float, longitude: float, query: dict, limit: int,
+                    max_distance_km: Optional[float] = None) -> list:
+    """
+    Run a $geoNear search over sellers with a location, nearest first.
+    Uses the (region, location) 2dsphere index when the query names a region.
+    """
+    geo_near = {
+        "near": to_point(latitude, longitude),
+        "key": "location",
+        "distanceField": "distance_m",
+        "spherical": True,
+        "query": query
+    }
+    if max_distance_km is not None:
+        geo_near["maxDistance"] = max_distance_km * 1000
+    
+    return list(seller_collection.aggregate([
+        {"$geoNear": geo_near},
+        {"$limit": limit},
+        {"$project": {"password": 0, "documents": 0, "upload_token_hash": 0}}
+    ]))
+
+
+@router.get("/suppliers/nearby")
+def get_nearby_suppliers(
+    lat: float = Query(..., description="Latitude of the delivery location"),
+    lng: float = Query(..., description="Longitude of the delivery location"),
+    items: Optional[List[str]] = Query(None, description="Products the supplier must stock"),
+    k: int = Query(5, ge=1, le=50, description="Number of suppliers to return"),
+    max_km: Optional[float] = Query(None, ge=0, description="Maximum distance in kilometres")
+):
+    """Get the k nearest approved sellers in the delivery location's region"""
+    try:
+        region = requested_region() or region_for_point(lat, lng)
+        query = scoped({"status": "approved"}, region)
+        # Products are matched on their normalized names (product_keys),
+        # so 'rice' finds a seller listing 'Basmati Rice'
+        wanted = {product_key(item) for item in items or []} - {""}
+        if wanted:
+            query["product_keys"] = {"$in": sorted(wanted)}
+        
+        sellers = nearest_sellers(lat, lng, query, k, max_km)
+        
+        result = []
+        for seller in sellers:
+            distance_km = round(seller["distance_m"] / 1000, 2)
+            longitude, latitude = seller["location"]["coordinates"]
+            result.append({
+                "id": str(seller["_id"]),
+                "name": seller["name"],
+                "phone": seller["phone"],
+                "products": seller.get("products", []),
+                "matched_products": [
+                    p for p in seller.get("products", []) if not wanted or wanted & set(product_keys(p))
+                ],
+                "rating": seller.get("rating", 0),
+                "latitude": latitude,
+                "longitude": longitude,
+                "distance_km": distance_km,
+                "estimated_delivery": estimate_delivery(distance_km)
+            })
+        
+        return {"success": True, "data": result, "count": len(result)}
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error finding nearby suppliers: {str(e)}")
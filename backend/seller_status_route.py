@@ -2,6 +2,8 @@ from fastapi import APIRouter, HTTPException, Path
 from pydantic import BaseModel
 from database import client
 from bson.objectid import ObjectId
+from event_log import event_log
+import http_cache
 
 router = APIRouter()
 
@@ -47,6 +49,9 @@ async def update_seller_status(
         
         if result.modified_count == 0:
             raise HTTPException(status_code=500, detail="Failed to update seller status")
+        http_cache.bump("seller", existing_seller.get("region"))
+        event_log.record("seller", seller_id, "status_changed",
+                         previous=existing_seller.get("status"), status=request.status)
         
         # Get updated seller data
         updated_seller = sellers_collection.find_one({"_id": object_id})
@@ -102,6 +107,8 @@ async def update_seller_status_alt(
         
         if result.modified_count == 0:
             raise HTTPException(status_code=500, detail="Failed to update seller status")
+        http_cache.bump("seller")
+        event_log.record("seller", seller_id, "status_changed", status=request.status)
         
         return {
             "success": True,
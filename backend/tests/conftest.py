@@ -0,0 +1,17 @@
+import os
+import sys
+import types
+from unittest import mock
+
+# The backend modules import each other by their flat names (run.py starts
+# uvicorn from backend/), so the tests do the same
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# database.py connects to the Atlas cluster on import. Tests never talk to
+# MongoDB: every collection is a mock unless a test swaps in its own.
+database = types.ModuleType("database")
+database.OLTP = "oltp"
+database.ANALYTICS = "analytics"
+database.SHARDED = False
+database.__getattr__ = lambda name: mock.MagicMock(name=f"database.{name}")
+sys.modules.setdefault("database", database)
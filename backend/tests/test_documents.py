@@ -0,0 +1,61 @@
+from unittest import mock
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+# The module opens its GridFS bucket on import
+with mock.patch("gridfs.GridFSBucket"):
+    from routes import documents
+from routes.documents import check_admin_token, check_upload_access, issue_upload_token, safe_filename, content_disposition
+
+
+def request(**headers) -> Request:
+    raw = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "headers": raw})
+
+
+@pytest.fixture(autouse=True)
+def admin_token(monkeypatch):
+    monkeypatch.setattr(documents, "ADMIN_TOKEN", "admin-secret")
+
+
+def test_pending_seller_uploads_with_its_own_token():
+    token, token_hash = issue_upload_token()
+    seller = {"status": "pending", "upload_token_hash": token_hash}
+
+    check_upload_access(request(x_upload_token=token), seller)
+
+    with pytest.raises(HTTPException) as error:
+        check_upload_access(request(x_upload_token="guess"), seller)
+    assert error.value.status_code == 403
+
+
+def test_seller_token_stops_working_once_approved():
+    token, token_hash = issue_upload_token()
+    seller = {"status": "approved", "upload_token_hash": token_hash}
+
+    with pytest.raises(HTTPException):
+        check_upload_access(request(x_upload_token=token), seller)
+    check_upload_access(request(x_admin_token="admin-secret"), seller)
+
+
+def test_downloads_need_the_admin_token():
+    token, _ = issue_upload_token()
+    with pytest.raises(HTTPException):
+        check_admin_token(request(x_upload_token=token))
+    with pytest.raises(HTTPException):
+        check_admin_token(request())
+    check_admin_token(request(x_admin_token="admin-secret"))
+
+
+def test_unset_admin_token_refuses_everyone(monkeypatch):
+    monkeypatch.setattr(documents, "ADMIN_TOKEN", "")
+    with pytest.raises(HTTPException):
+        check_admin_token(request(x_admin_token=""))
+
+
+def test_filenames_are_safe_in_content_disposition():
+    assert safe_filename('a"; x=.pdf', "pan.pdf") == "a; x=.pdf"
+    assert safe_filename("../../etc/passwd", "pan.pdf") == "passwd"
+    assert safe_filename("\r\n", "pan.pdf") == "pan.pdf"
+    assert content_disposition("pässbook.pdf") == "inline; filename=\"p_ssbook.pdf\"; filename*=UTF-8''p%C3%A4ssbook.pdf"
@@ -0,0 +1,45 @@
+from unittest import mock
+from pymongo.errors import AutoReconnect
+from event_log import EventLog
+
+
+def failing_collection():
+    collection = mock.Mock()
+    collection.insert_one.side_effect = AutoReconnect("connection refused")
+    collection.insert_many.side_effect = AutoReconnect("connection refused")
+    return collection
+
+
+def test_record_before_start_is_buffered_not_written():
+    collection = failing_collection()
+    log = EventLog(collection)
+
+    log.record("order", "AB12CD34", "created", status="pending")
+
+    collection.insert_one.assert_not_called()
+    assert [event["event"] for event in log.pending_for("order", "AB12CD34")] == ["created"]
+
+
+def test_full_buffer_drops_instead_of_writing_inline():
+    collection = failing_collection()
+    log = EventLog(collection, max_pending=2)
+
+    for _ in range(5):
+        log.record("order", "AB12CD34", "status_changed", status="shipped")
+
+    collection.insert_one.assert_not_called()
+    assert len(log.pending_for("order", "AB12CD34")) == 2
+    assert log.dropped == 3
+
+
+def test_failed_flush_keeps_events_buffered():
+    collection = failing_collection()
+    log = EventLog(collection)
+    log.record("seller", "s1", "registered")
+
+    assert log._flush_batch() is None
+    assert len(log.pending_for("seller", "s1")) == 1
+
+    collection.insert_many.side_effect = None
+    assert log._flush_batch() == 1
+    assert log.pending_for("seller", "s1") == []
@@ -0,0 +1,81 @@
+from concurrent.futures import Future
+from unittest import mock
+import pytest
+from pymongo.errors import AutoReconnect
+import change_feed
+import order_commit
+from order_commit import OrderBatcher, STOCK_PENDING, commit_order
+
+
+def order(order_id: str) -> dict:
+    return {
+        "order_id": order_id,
+        "vendor_id": "v1",
+        "region": "pune",
+        "items": [{"item_id": "0" * 24, "quantity": 2, "supplier": "Sharma Traders"}],
+        "total_amount": 100
+    }
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """Fresh mock collections and counter; side effects are not queued"""
+    orders = mock.Mock()
+    inventory = mock.Mock()
+    counters = mock.Mock()
+    counters.find_one_and_update.return_value = {"seq": 10}
+    monkeypatch.setattr(order_commit, "order_collection", orders)
+    monkeypatch.setattr(order_commit, "inventory_collection", inventory)
+    monkeypatch.setattr(change_feed, "counter_collection", counters)
+    monkeypatch.setattr(order_commit, "enqueue_order_side_effects", mock.Mock())
+    monkeypatch.setattr(order_commit.http_cache, "bump", mock.Mock())
+    return mock.Mock(orders=orders, inventory=inventory, counters=counters)
+
+
+def flagged(orders) -> list:
+    return [call.args[0]["order_id"]["$in"] for call in orders.update_many.call_args_list]
+
+
+def test_commit_order_reports_stored_order_when_stock_update_fails(db):
+    db.inventory.find_one_and_update.side_effect = AutoReconnect("connection reset")
+
+    assert commit_order(order("A1")) == STOCK_PENDING
+    assert flagged(db.orders) == [["A1"]]
+    assert change_feed.safe_cursor() == 10
+
+
+def test_commit_order_reports_stored_order_when_sequence_allocation_fails(db):
+    db.counters.find_one_and_update.side_effect = AutoReconnect("connection reset")
+
+    assert commit_order(order("A2")) == STOCK_PENDING
+    db.orders.insert_one.assert_called_once()
+    assert flagged(db.orders) == [["A2"]]
+
+
+def test_commit_order_succeeds(db):
+    db.inventory.find_one_and_update.return_value = None
+
+    assert commit_order(order("A3")) is None
+    db.orders.update_many.assert_not_called()
+
+
+def test_group_commit_resolves_futures_when_bulk_write_fails(db):
+    db.inventory.bulk_write.side_effect = AutoReconnect("connection reset")
+    db.inventory.find.return_value = []
+    batch = [(order("B1"), Future()), (order("B2"), Future())]
+
+    OrderBatcher()._commit(batch)
+
+    assert [future.result(timeout=0) for _, future in batch] == [STOCK_PENDING, STOCK_PENDING]
+    assert flagged(db.orders) == [["B1", "B2"]]
+
+
+def test_group_commit_fails_futures_when_insert_fails(db):
+    db.orders.insert_many.side_effect = AutoReconnect("connection reset")
+    batch = [(order("C1"), Future())]
+
+    OrderBatcher()._commit(batch)
+
+    with pytest.raises(AutoReconnect):
+        batch[0][1].result(timeout=0)
+    db.inventory.bulk_write.assert_not_called()
@@ -0,0 +1,98 @@
+import pytest
+from price_compare import PriceComparisonIndex, canonical_name, normalize_unit, product_keys
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("Basmati Rice", ("rice", "basmati")),
+    ("Rice", ("rice", "")),
+    ("Basmati Chawal", ("rice", "basmati")),
+    ("Tomatoes", ("tomato", "")),
+    ("Turmeric Powder", ("turmeric powder", "")),
+    ("Red Chilli Powder", ("chilli powder", "red")),
+    ("Coriander Leaves", ("coriander leaf", "")),
+    ("Mint Leaves", ("mint leaf", "")),
+    ("Sugar 1kg", ("sugar", "")),
+    ("Sugar 1 kg", ("sugar", "")),
+    ("Amul Butter 500g Pack", ("butter", "amul")),
+    ("Sunflower Oil 1L", ("oil", "sunflower")),
+    ("Eggs (1 dozen)", ("egg", "")),
+    ("", ("", "")),
+])
+def test_canonical_name(name, expected):
+    assert canonical_name(name) == expected
+
+
+@pytest.mark.parametrize("unit, expected", [
+    ("kg", ("kg", 1)),
+    ("KG", ("kg", 1)),
+    ("500 g", ("kg", 0.5)),
+    ("500g", ("kg", 0.5)),
+    ("1 quintal", ("kg", 100)),
+    ("250 ml", ("liter", 0.25)),
+    ("litre", ("liter", 1)),
+    ("dozen", ("piece", 12)),
+    ("packet", ("packet", 1)),
+    ("bunch", ("bunch", 1)),
+    ("", ("", 1)),
+])
+def test_normalize_unit(unit, expected):
+    base, factor = normalize_unit(unit)
+    assert base == expected[0]
+    assert factor == pytest.approx(expected[1])
+
+
+def offer(item_id, name, price, unit="kg", stock=10):
+    return {"_id": item_id, "name": name, "price": price, "unit": unit, "supplier": "s", "stock": stock}
+
+
+@pytest.fixture
+def index():
+    index = PriceComparisonIndex()
+    index.load([
+        offer("1", "Turmeric Powder", 200),
+        offer("2", "Red Chilli Powder", 150),
+        offer("3", "Haldi Powder", 90, unit="500 g"),
+        offer("4", "Basmati Rice", 120),
+        offer("5", "Rice", 50),
+        offer("6", "Sugar 1kg", 45),
+        offer("7", "Salt 1kg", 20),
+        offer("8", "Rice", 40, stock=0),
+    ])
+    return index
+
+
+def names(groups) -> list:
+    return [[o["name"] for o in group["offers"]] for group in groups]
+
+
+def test_compare_keeps_different_powders_apart(index):
+    # Haldi Powder is 90 per 500 g, i.e. 180 per kg
+    assert names(index.compare("Turmeric Powder")) == [["Haldi Powder", "Turmeric Powder"]]
+
+
+def test_compare_matches_a_word_of_the_name(index):
+    assert names(index.compare("turmeric")) == [["Haldi Powder", "Turmeric Powder"]]
+    assert names(index.compare("basmati")) == [["Basmati Rice"]]
+
+
+def test_compare_ignores_pack_sizes(index):
+    assert names(index.compare("sugar")) == [["Sugar 1kg"]]
+    assert index.compare("kg") == []
+
+
+def test_compare_skips_out_of_stock_unless_asked(index):
+    assert names(index.compare("rice")) == [["Rice", "Basmati Rice"]]
+    assert names(index.compare("rice", in_stock_only=False)) == [["Rice", "Rice", "Basmati Rice"]]
+
+
+def test_upsert_and_remove_keep_groups_sorted(index):
+    index.upsert(offer("1", "Turmeric Powder", 100))
+    assert names(index.compare("turmeric")) == [["Turmeric Powder", "Haldi Powder"]]
+    index.remove("1")
+    index.remove("3")
+    assert index.compare("turmeric") == []
+
+
+def test_product_keys():
+    assert product_keys("Basmati Rice") == ["basmati rice", "rice"]
+    assert product_keys("Sugar 1kg") == ["sugar"]
@@ -0,0 +1,182 @@
+import time
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pymongo.errors import AutoReconnect, DuplicateKeyError, NetworkTimeout
+import resilience
+from resilience import CircuitBreaker, DatabaseUnavailable, DeadlineMiddleware, StaleCache
+
+
+class FlakyCollection:
+    """
+    Stand-in for a pymongo collection. Each find() first takes `latency`
+    seconds, then raises AutoReconnect while `down` is set. Like the
+    driver under pymongo.timeout(), a call that would outlast the
+    operation's time limit gives up at the limit with NetworkTimeout.
+    """
+
+    def __init__(self, docs=None):
+        self.docs = docs or [{"name": "Basmati Rice"}]
+        self.down = False
+        self.latency = 0
+        self.calls = 0
+
+    def find(self, query=None):
+        self.calls += 1
+        limit = resilience.remaining()
+        if self.latency > limit:
+            time.sleep(max(limit, 0))
+            raise NetworkTimeout("timed out")
+        time.sleep(self.latency)
+        if self.down:
+            raise AutoReconnect("connection refused")
+        return list(self.docs)
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    breaker = CircuitBreaker("oltp", failures=3, reset_after=0.2)
+    monkeypatch.setitem(resilience.breakers, "oltp", breaker)
+    monkeypatch.setattr(resilience, "stale_cache", StaleCache())
+    monkeypatch.setattr(resilience, "READ_RETRIES", 0)
+    return breaker
+
+
+@pytest.fixture
+def collection():
+    return FlakyCollection()
+
+
+def test_breaker_opens_after_consecutive_failures(breaker, collection):
+    collection.down = True
+    for _ in range(3):
+        with pytest.raises(DatabaseUnavailable):
+            resilience.read(lambda: collection.find())
+    assert breaker.state == "open"
+
+    calls = collection.calls
+    started = time.monotonic()
+    with pytest.raises(DatabaseUnavailable) as error:
+        resilience.read(lambda: collection.find())
+    # Fails fast without touching the database, and tells the client when to retry
+    assert collection.calls == calls
+    assert time.monotonic() - started < 0.05
+    assert error.value.status_code == 503
+    assert "Retry-After" in error.value.headers
+
+
+def test_half_open_trial_closes_the_breaker(breaker, collection):
+    collection.down = True
+    for _ in range(3):
+        with pytest.raises(DatabaseUnavailable):
+            resilience.read(lambda: collection.find())
+
+    collection.down = False
+    time.sleep(0.25)
+    assert resilience.read(lambda: collection.find()) == collection.docs
+    assert breaker.state == "closed"
+
+
+def test_failed_trial_reopens_the_breaker(breaker, collection):
+    collection.down = True
+    for _ in range(3):
+        with pytest.raises(DatabaseUnavailable):
+            resilience.read(lambda: collection.find())
+
+    time.sleep(0.25)
+    with pytest.raises(DatabaseUnavailable):
+        resilience.read(lambda: collection.find())
+    assert breaker.is_open()
+
+
+def test_non_transient_errors_do_not_open_the_breaker(breaker):
+    def duplicate():
+        raise DuplicateKeyError("E11000 duplicate key")
+
+    for _ in range(5):
+        with pytest.raises(DuplicateKeyError):
+            resilience.read(duplicate)
+    assert breaker.state == "closed"
+
+
+def test_stale_result_served_while_database_is_down(breaker, collection):
+    assert resilience.read(lambda: collection.find(), cache_key="items") == collection.docs
+
+    collection.down = True
+    for _ in range(5):
+        assert resilience.read(lambda: collection.find(), cache_key="items") == collection.docs
+    assert breaker.state == "open"
+
+
+def test_transient_failures_are_retried(breaker, monkeypatch):
+    monkeypatch.setattr(resilience, "READ_RETRIES", 2)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise AutoReconnect("primary stepped down")
+        return "ok"
+
+    assert resilience.read(flaky) == "ok"
+    assert len(attempts) == 3
+
+
+def make_app(collection):
+    app = FastAPI()
+
+    @app.get("/items")
+    def items():
+        return resilience.read(lambda: collection.find(), cache_key="items")
+
+    app.add_middleware(DeadlineMiddleware)
+    return app
+
+
+def test_deadline_cuts_off_a_slow_database(breaker, collection):
+    client = TestClient(make_app(collection))
+    collection.latency = 2
+
+    started = time.monotonic()
+    response = client.get("/items", headers={"X-Request-Budget-Ms": "300"})
+    elapsed = time.monotonic() - started
+
+    assert response.status_code == 503
+    assert elapsed < 1
+
+
+def test_short_client_budgets_do_not_open_the_breaker(breaker, collection, monkeypatch):
+    monkeypatch.setattr(resilience, "MIN_REQUEST_BUDGET_MS", 50)
+    client = TestClient(make_app(collection))
+    collection.latency = 2
+
+    for _ in range(5):
+        response = client.get("/items", headers={"X-Request-Budget-Ms": "1"})
+        assert response.status_code == 503
+    assert breaker.state == "closed"
+
+    collection.latency = 0
+    assert client.get("/items").status_code == 200
+
+
+def test_client_budget_has_a_floor(breaker, collection, monkeypatch):
+    monkeypatch.setattr(resilience, "MIN_REQUEST_BUDGET_MS", 200)
+    client = TestClient(make_app(collection))
+    collection.latency = 0.1
+
+    response = client.get("/items", headers={"X-Request-Budget-Ms": "1"})
+    assert response.status_code == 200
+
+
+def test_stale_response_is_kept_out_of_http_caches(breaker, collection):
+    client = TestClient(make_app(collection))
+    fresh = client.get("/items")
+    assert fresh.status_code == 200
+    assert "warning" not in fresh.headers
+
+    collection.down = True
+    stale = client.get("/items")
+    assert stale.status_code == 200
+    assert stale.json() == fresh.json()
+    assert stale.headers["cache-control"] == "no-store"
+    assert "Stale" in stale.headers["warning"]
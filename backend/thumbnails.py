@@ -0,0 +1,199 @@
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+from PIL import Image, ImageOps
+
+# Longest edge in pixels for each thumbnail size
+SIZES = {"sm": 96, "md": 240, "lg": 480}
+FORMATS = {"webp": "image/webp", "jpeg": "image/jpeg"}
+
+CACHE_DIR = os.getenv("THUMBNAIL_CACHE_DIR", "thumbnail_cache")
+MAX_CACHE_BYTES = int(os.getenv("THUMBNAIL_CACHE_MAX_MB", "512")) * 1024 * 1024
+MAX_SOURCE_BYTES = 15 * 1024 * 1024
+FETCH_TIMEOUT = 10
+
+
+def render_thumbnails(source_path: str, out_dir: str, key: str) -> list:
+    """
+    Decode one source image and write every size/format for it.
+    Runs in a worker process; returns [(path, bytes written), ...].
+    """
+    written = []
+    with Image.open(source_path) as image:
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ("RGBA", "LA") or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+        for size_name, edge in SIZES.items():
+            thumb = image.copy()
+            thumb.thumbnail((edge, edge), Image.LANCZOS)
+            for fmt in FORMATS:
+                out = thumb if fmt == "webp" or not has_alpha else thumb.convert("RGB")
+                path = os.path.join(out_dir, f"{key}_{size_name}.{fmt}")
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                if fmt == "webp":
+                    out.save(tmp_path, "WEBP", quality=80, method=4)
+                else:
+                    out.save(tmp_path, "JPEG", quality=80, optimize=True, progressive=True)
+                os.replace(tmp_path, path)
+                written.append((path, os.path.getsize(path)))
+    return written
+
+
+class ThumbnailCache:
+    """
+    Content-addressed thumbnail store on local disk. Files are keyed by the
+    SHA-256 of the source image and evicted least-recently-used once the
+    cache directory grows past MAX_CACHE_BYTES. Source images in originals/
+    count towards that limit too; serving a thumbnail keeps its source
+    recent. Rendering happens in a process pool so it neither blocks the
+    event loop nor holds the GIL.
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR, max_bytes: int = MAX_CACHE_BYTES, workers: int = None):
+        self.cache_dir = cache_dir
+        self.source_dir = os.path.join(cache_dir, "originals")
+        self.max_bytes = max_bytes
+        self.workers = workers or os.cpu_count()
+        self._pool = None
+        self._lock = Lock()
+        self._entries = OrderedDict()  # path -> size, least recently used first
+        self._total = 0
+        self._rendering = {}  # key -> asyncio future, so concurrent requests share one render
+
+    def start(self):
+        os.makedirs(self.source_dir, exist_ok=True)
+        # Rebuild the LRU order from modification times of existing files
+        files = []
+        for directory in (self.cache_dir, self.source_dir):
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                if os.path.isfile(path) and not name.endswith(".tmp"):
+                    stat = os.stat(path)
+                    files.append((stat.st_mtime, path, stat.st_size))
+        with self._lock:
+            for _, path, size in sorted(files):
+                self._entries[path] = size
+                self._total += size
+        # Spawn rather than fork: the API process runs background threads
+        # and holds MongoClients, neither of which survives a fork safely
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def stop(self):
+        if self._pool:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def path_for(self, key: str, size: str, fmt: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}_{size}.{fmt}")
+
+    def source_path(self, key: str) -> str:
+        return os.path.join(self.source_dir, key)
+
+    def has_source(self, key: str) -> bool:
+        return os.path.exists(self.source_path(key))
+
+    def store_source(self, tmp_path: str, key: str):
+        """Move a fully written upload into place under its content hash"""
+        path = self.source_path(key)
+        os.replace(tmp_path, path)
+        # Counted now, evicted by the render that follows
+        self._track([(path, os.path.getsize(path))])
+
+    def remove_source(self, key: str):
+        """Delete a stored source image, e.g. one that could not be rendered"""
+        path = self.source_path(key)
+        self._forget(path)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def fetch_source(self, url: str) -> str:
+        """Download a remote image once and store it by content hash (blocking)"""
+        os.makedirs(self.source_dir, exist_ok=True)
+        sha256 = hashlib.sha256()
+        tmp_path = os.path.join(self.source_dir, f"fetch.{os.getpid()}.{id(sha256)}.tmp")
+        size = 0
+        try:
+            with urllib.request.urlopen(url, timeout=FETCH_TIMEOUT) as response, open(tmp_path, "wb") as out:
+                while chunk := response.read(256 * 1024):
+                    size += len(chunk)
+                    if size > MAX_SOURCE_BYTES:
+                        raise ValueError("Source image is too large")
+                    sha256.update(chunk)
+                    out.write(chunk)
+            key = sha256.hexdigest()
+            self.store_source(tmp_path, key)
+            return key
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def lookup(self, key: str, size: str, fmt: str):
+        """Return the cached thumbnail path and mark it recently used, or None"""
+        path = self.path_for(key, size, fmt)
+        with self._lock:
+            if path not in self._entries:
+                return None
+            self._entries.move_to_end(path)
+            source = self.source_path(key)
+            if source in self._entries:
+                self._entries.move_to_end(source)
+        try:
+            # Persist recency so the LRU order survives restarts
+            os.utime(path)
+        except FileNotFoundError:
+            self._forget(path)
+            return None
+        return path
+
+    async def render(self, key: str):
+        """Render every size/format for a source in the process pool"""
+        loop = asyncio.get_running_loop()
+        pending = self._rendering.get(key)
+        if pending is None:
+            pending = loop.run_in_executor(self._pool, render_thumbnails, self.source_path(key), self.cache_dir, key)
+            self._rendering[key] = pending
+            pending.add_done_callback(lambda _: self._rendering.pop(key, None))
+        written = await pending
+        self._track(written)
+        await asyncio.to_thread(self._evict)
+
+    async def get(self, key: str, size: str, fmt: str) -> str:
+        path = self.lookup(key, size, fmt)
+        if path is None:
+            await self.render(key)
+            path = self.path_for(key, size, fmt)
+        return path
+
+    def _evict(self):
+        while True:
+            with self._lock:
+                if self._total <= self.max_bytes or not self._entries:
+                    return
+                path, size = self._entries.popitem(last=False)
+                self._total -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _track(self, files: list):
+        """Add or refresh [(path, size), ...] as most recently used"""
+        with self._lock:
+            for path, size in files:
+                self._total -= self._entries.pop(path, 0)
+                self._entries[path] = size
+                self._total += size
+
+    def _forget(self, path: str):
+        with self._lock:
+            self._total -= self._entries.pop(path, 0)
+
+
+thumbnail_cache = ThumbnailCache()